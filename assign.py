@@ -4,21 +4,22 @@ from typing import List, Annotated, Optional
 from datetime import datetime
 from pathlib import Path
 import uuid
-import shutil
+from secrets import token_hex
 import requests
-import os
 
 from database import get_db
 from models import Client, User, ClientEmail, ClientPhoneNumber
 from schemas import ClientResponse, AssignClientRequest, ClientCreate
 from users import get_admin_user, get_analyst_user, get_current_user
+from deps import invalidate_client_access
+from uploads import save_upload
+from urls import client_image_url
 
 router = APIRouter()
 
 # Upload directory setup
 UPLOAD_DIR = Path("uploads/client_images")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-BASE_URL = "https://obsecureiqbackendv1-production-e750.up.railway.app"
 
 def clean_phone_number(phone: str) -> str:
     """Clean and normalize phone number by removing formatting characters"""
@@ -38,7 +39,7 @@ def update_image_url(client):
         # Extract just the filename from the stored URL
         filename = client.profile_photo_url.split('/')[-1]
         # Reconstruct URL with current BASE_URL
-        client.profile_photo_url = f"{BASE_URL}/uploads/client_images/{filename}"
+        client.profile_photo_url = client_image_url(filename)
     return client
 
 @router.post("/clients", response_model=ClientResponse, status_code=status.HTTP_201_CREATED)
@@ -63,14 +64,13 @@ def create_client(
     # Handle profile photo upload
     if profile_photo:
         ext = Path(profile_photo.filename).suffix or ".jpg"
-        filename = f"{uuid.uuid4()}{ext}"
+        filename = f"{token_hex(16)}{ext}"
         path = UPLOAD_DIR / filename
         
-        with path.open("wb") as f:
-            shutil.copyfileobj(profile_photo.file, f)
+        save_upload(profile_photo, path)
         
         # Create complete image URL
-        profile_photo_url = f"{BASE_URL}/uploads/client_images/{filename}"
+        profile_photo_url = client_image_url(filename)
     
     # Parse date_of_birth if provided
     parsed_date = None
@@ -166,7 +166,7 @@ def assign_client_to_analyst(
 ):
     """Assign client to analyst (Admin only)"""
     # Check if client exists
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = db.get(Client, client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
 
@@ -182,6 +182,7 @@ def assign_client_to_analyst(
     client.analyst_id = analyst.id
     client.assigned_at = datetime.utcnow()
     db.commit()
+    invalidate_client_access(client_id)
 
     return {"message": f"Client assigned to analyst {analyst.full_name}"}
 
@@ -193,7 +194,7 @@ def unassign_client(
 ):
     """Unassign client from analyst (Admin only)"""
     # Check if client exists
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = db.get(Client, client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
 
@@ -204,6 +205,7 @@ def unassign_client(
     client.analyst_id = None
     client.assigned_at = None
     db.commit()
+    invalidate_client_access(client_id)
 
     return {"message": "Client unassigned successfully"}
 
@@ -225,7 +227,7 @@ def update_client(
     db: Session = Depends(get_db)
 ):
     """Update client (Admin or assigned Analyst)"""
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = db.get(Client, client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
@@ -249,14 +251,13 @@ def update_client(
         
         # Save new photo
         ext = Path(profile_photo.filename).suffix or ".jpg"
-        filename = f"{uuid.uuid4()}{ext}"
+        filename = f"{token_hex(16)}{ext}"
         path = UPLOAD_DIR / filename
         
-        with path.open("wb") as f:
-            shutil.copyfileobj(profile_photo.file, f)
+        save_upload(profile_photo, path)
         
         # Create complete image URL
-        client.profile_photo_url = f"{BASE_URL}/uploads/client_images/{filename}"
+        client.profile_photo_url = client_image_url(filename)
     
     # Update only provided fields
     if full_name is not None:
@@ -344,13 +345,14 @@ def delete_client(
 ):
     """Delete client completely (Admin only)"""
     # Check if client exists
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = db.get(Client, client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
 
     # Delete the client
     db.delete(client)
     db.commit()
+    invalidate_client_access(client_id)
 
     return {"message": "Client deleted successfully"}
 
@@ -1,14 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime, timezone
 import uuid
 import requests
+import orjson
 
 from database import get_db
 from models import Client, ClientAddress, User
 from schemas import AddressCreate, AddressUpdate, AddressResponse, BulkAddressUpload
 from users import get_current_user
+from deps import authorize_client
 
 router = APIRouter()
 
@@ -19,12 +20,7 @@ def get_client_addresses(
     db: Session = Depends(get_db)
 ):
     """Get all addresses for a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     addresses = db.query(ClientAddress).filter(
         ClientAddress.client_id == client_id
@@ -40,7 +36,7 @@ def add_client_address(
     db: Session = Depends(get_db)
 ):
     """Add a new address"""
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = db.get(Client, client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
@@ -67,7 +63,7 @@ def add_client_address(
     
     try:
         response = requests.post(webhook_url, json=payload, timeout=60)
-        n8n_result = response.json()
+        n8n_result = orjson.loads(response.content)
 
         if n8n_result.get("status") == "Success" or n8n_result.get("success") is True:
             return {
@@ -92,12 +88,7 @@ def edit_client_address(
     db: Session = Depends(get_db)
 ):
     """Edit an address"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     address_record = db.query(ClientAddress).filter(
         ClientAddress.id == address_id,
@@ -114,8 +105,6 @@ def edit_client_address(
     for field, value in update_data.items():
         setattr(address_record, field, value)
     
-    address_record.updated_at = datetime.now(timezone.utc)
-    
     db.commit()
     db.refresh(address_record)
     
@@ -129,12 +118,7 @@ def delete_client_address(
     db: Session = Depends(get_db)
 ):
     """Delete an address"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     address_record = db.query(ClientAddress).filter(
         ClientAddress.id == address_id,
@@ -159,12 +143,7 @@ def bulk_upload_addresses(
     """Send raw addresses directly to n8n webhook and return actual result"""
     
     # Check client access
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     # n8n Webhook URL
     webhook_url = "https://obscureiq.app.n8n.cloud/webhook/2e898a83-9646-491d-a0b9-6d85c2b8c437"
@@ -179,7 +158,7 @@ def bulk_upload_addresses(
         response = requests.post(webhook_url, json=payload, timeout=60)
 
         # n8n returns JSON because of responseMode="responseNode"
-        n8n_result = response.json()
+        n8n_result = orjson.loads(response.content)
 
         # SUCCESS CASE
         if n8n_result.get("status") == "Success" or n8n_result.get("success") is True:
@@ -4,9 +4,10 @@ from typing import List
 import uuid
 
 from database import get_db
-from models import Client, ClientAIAnalysis, User
+from models import ClientAIAnalysis, User
 from schemas import AIAnalysisResponse
 from users import get_current_user
+from deps import authorize_client
 
 router = APIRouter()
 
@@ -17,12 +18,7 @@ def get_ai_analysis(
     db: Session = Depends(get_db)
 ):
     """Get AI analysis for a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     return db.query(ClientAIAnalysis).filter(
         ClientAIAnalysis.client_id == client_id
@@ -36,12 +32,7 @@ def delete_ai_analysis(
     db: Session = Depends(get_db)
 ):
     """Delete AI analysis record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     record = db.query(ClientAIAnalysis).filter(
         ClientAIAnalysis.id == analysis_id,
@@ -1,19 +1,18 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime, timezone
 from pathlib import Path
 import uuid
-import shutil
-import os
+from secrets import token_hex
 
 from database import get_db
 from models import Client, ClientBreachedRecord, User
 from schemas import BreachedRecordResponse
 from users import get_current_user
+from uploads import save_upload
+from urls import client_image_url
 
 router = APIRouter()
-BASE_URL = "https://obsecureiqbackendv1-production-e750.up.railway.app"
 
 # Upload directory setup
 UPLOAD_DIR = Path("uploads/client_images")
@@ -21,7 +20,7 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 def _validate_client_access(client_id: uuid.UUID, current_user: User, db: Session) -> Client:
     """Validate client exists and user has access"""
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = db.get(Client, client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
@@ -60,16 +59,15 @@ def upload_breached_records(
 
     for csv_file in csv_files:
         ext = Path(csv_file.filename).suffix or ".csv"
-        filename = f"{uuid.uuid4()}{ext}"
+        filename = f"{token_hex(16)}{ext}"
         filepath = UPLOAD_DIR / filename
 
         try:
-            with filepath.open("wb") as f:
-                shutil.copyfileobj(csv_file.file, f)
+            save_upload(csv_file, filepath)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
 
-        file_url = f"{BASE_URL}/uploads/client_images/{filename}"
+        file_url = client_image_url(filename)
 
         record = ClientBreachedRecord(
             client_id=client_id,
@@ -115,12 +113,11 @@ def update_breached_record(
 
     # Save new file
     ext = Path(csv_file.filename).suffix or ".csv"
-    filename = f"{uuid.uuid4()}{ext}"
+    filename = f"{token_hex(16)}{ext}"
     filepath = UPLOAD_DIR / filename
 
     try:
-        with filepath.open("wb") as f:
-            shutil.copyfileobj(csv_file.file, f)
+        save_upload(csv_file, filepath)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
 
@@ -132,8 +129,7 @@ def update_breached_record(
     except Exception as e:
         print(f"Warning: {e}")
 
-    record.file_url = f"{BASE_URL}/uploads/client_images/{filename}"
-    record.updated_at = datetime.now(timezone.utc)
+    record.file_url = client_image_url(filename)
 
     db.commit()
     db.refresh(record)
@@ -1,24 +1,33 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime, timezone
 from pathlib import Path
 import uuid
-import shutil
-import os
+from secrets import token_hex
+import orjson
 
 from database import get_db
-from models import Client, ClientBrokerScreenRecord, User
+from models import ClientBrokerScreenRecord, User
 from schemas import BrokerScreenRecordResponse, BrokerScreenRecordUpdate
 from users import get_current_user
+from deps import authorize_client, get_authorized_record
+from uploads import safe_unlink, save_upload, save_uploads_parallel, validate_image
+from urls import client_image_url
 
 router = APIRouter()
-BASE_URL = "https://obsecureiqbackendv1-production-e750.up.railway.app"
 
 # Upload directory setup
 UPLOAD_DIR = Path("uploads/client_images")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+def _save_image(image: UploadFile) -> str:
+    """Save an uploaded image under a new name and return its public URL"""
+    ext = Path(image.filename).suffix or ".jpg"
+    filename = f"{token_hex(16)}{ext}"
+    save_upload(image, UPLOAD_DIR / filename)
+    
+    return client_image_url(filename)
+
 @router.get("/clients/{client_id}/broker-screen-records", response_model=List[BrokerScreenRecordResponse], tags=["Broker Screen Records"])
 def get_broker_screen_records(
     client_id: uuid.UUID,
@@ -26,12 +35,7 @@ def get_broker_screen_records(
     db: Session = Depends(get_db)
 ):
     """Get all broker screen records for a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     return db.query(ClientBrokerScreenRecord).filter(
         ClientBrokerScreenRecord.client_id == client_id
@@ -52,26 +56,14 @@ def create_broker_screen_record(
     if not images:
         raise HTTPException(status_code=400, detail="At least one image is required")
 
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    image_urls = []
-
+    # Reject the whole request before any disk write if one file is invalid
     for image in images:
-        ext = Path(image.filename).suffix or ".jpg"
-        filename = f"{uuid.uuid4()}{ext}"
-        path = UPLOAD_DIR / filename
+        validate_image(image)
 
-        with path.open("wb") as f:
-            shutil.copyfileobj(image.file, f)
+    authorize_client(db, client_id, current_user)
 
-        # Create complete image URL for database
-        url = f"{BASE_URL}/uploads/client_images/{filename}"
-        image_urls.append(url)
+    # Save all images in parallel
+    image_urls = save_uploads_parallel(_save_image, images)
 
     # Create a single record with multiple images
     record = ClientBrokerScreenRecord(
@@ -105,12 +97,11 @@ def update_broker_screen_record(
 ):
     """Update a broker screen record"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
+    # Reject the whole request before any disk write if one file is invalid
+    for image in images or []:
+        validate_image(image)
     
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     record = db.query(ClientBrokerScreenRecord).filter(
         ClientBrokerScreenRecord.id == record_id,
@@ -121,9 +112,8 @@ def update_broker_screen_record(
         raise HTTPException(status_code=404, detail="Broker screen record not found")
     
     try:
-        import json
-        record_data = json.loads(data)
-    except json.JSONDecodeError:
+        record_data = orjson.loads(data)
+    except orjson.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON data")
     
     # Update broker name
@@ -134,36 +124,16 @@ def update_broker_screen_record(
     
     # Handle images
     remaining_images = record_data.get('remaining_images', [])
+    remaining_set = set(remaining_images)
     
     # Delete removed images from filesystem
     if record.images:
         for old_image_url in record.images:
-            if old_image_url not in remaining_images:
-                try:
-                    old_path = UPLOAD_DIR / Path(old_image_url).name
-                    if old_path.exists():
-                        old_path.unlink()
-                except Exception as e:
-                    print(f"Warning: Could not delete old image: {str(e)}")
-    
-    # Start with remaining images
-    final_images = remaining_images.copy()
-    
-    # Add new uploaded images
-    if images:
-        for image in images:
-            ext = Path(image.filename).suffix or ".jpg"
-            filename = f"{uuid.uuid4()}{ext}"
-            path = UPLOAD_DIR / filename
-
-            with path.open("wb") as f:
-                shutil.copyfileobj(image.file, f)
-
-            url = f"{BASE_URL}/uploads/client_images/{filename}"
-            final_images.append(url)
+            if old_image_url not in remaining_set:
+                safe_unlink(UPLOAD_DIR / Path(old_image_url).name)
     
-    record.images = final_images
-    record.updated_at = datetime.now(timezone.utc)
+    # Remaining images followed by the new uploads, saved in parallel
+    record.images = remaining_images + save_uploads_parallel(_save_image, images or [])
     
     db.commit()
     db.refresh(record)
@@ -178,26 +148,12 @@ def delete_broker_screen_record(
     db: Session = Depends(get_db)
 ):
     """Delete a broker screen record"""
-    record = db.query(ClientBrokerScreenRecord).filter(
-        ClientBrokerScreenRecord.id == record_id,
-        ClientBrokerScreenRecord.client_id == client_id
-    ).first()
-
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-
-    if current_user.role == "Analyst" and record.client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    record = get_authorized_record(db, ClientBrokerScreenRecord, record_id, client_id, current_user, "Record not found")
 
     # Delete all images from filesystem
     if record.images:
         for image_url in record.images:
-            try:
-                old_path = UPLOAD_DIR / Path(image_url).name
-                if old_path.exists():
-                    old_path.unlink()
-            except Exception as e:
-                print(f"Warning: Could not delete image: {str(e)}")
+            safe_unlink(UPLOAD_DIR / Path(image_url).name)
 
     db.delete(record)
     db.commit()
@@ -1,13 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime, timezone
 import uuid
 
 from database import get_db
-from models import Client, ClientBusinessInfo, User
+from models import ClientBusinessInfo, User
 from schemas import BusinessInfoCreate, BusinessInfoUpdate, BusinessInfoResponse
 from users import get_current_user
+from deps import authorize_client
 
 router = APIRouter()
 
@@ -18,12 +18,7 @@ def get_business_info(
     db: Session = Depends(get_db)
 ):
     """Get all business information for a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     return db.query(ClientBusinessInfo).filter(
         ClientBusinessInfo.client_id == client_id
@@ -37,12 +32,7 @@ def create_business_info(
     db: Session = Depends(get_db)
 ):
     """Create new business information"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     if not data.business_name.strip() or not data.business_information.strip():
         raise HTTPException(status_code=400, detail="Both fields are required")
@@ -68,12 +58,7 @@ def update_business_info(
     db: Session = Depends(get_db)
 ):
     """Update business information"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     record = db.query(ClientBusinessInfo).filter(
         ClientBusinessInfo.id == info_id,
@@ -93,7 +78,6 @@ def update_business_info(
     for field, value in updates.items():
         setattr(record, field, value)
 
-    record.updated_at = datetime.now(timezone.utc)
     db.commit()
     db.refresh(record)
 
@@ -107,12 +91,7 @@ def delete_business_info(
     db: Session = Depends(get_db)
 ):
     """Delete business information"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     record = db.query(ClientBusinessInfo).filter(
         ClientBusinessInfo.id == info_id,
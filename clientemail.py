@@ -1,14 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime, timezone
 import uuid
 import requests
+import orjson
 
 from database import get_db
-from models import Client, ClientEmail, ClientPhoneNumber, User
+from models import ClientEmail, ClientPhoneNumber, User
 from schemas import EmailCreate, EmailUpdate, EmailResponse, BulkEmailUpload
 from users import get_current_user
+from deps import authorize_client
 
 router = APIRouter()
 
@@ -35,12 +36,7 @@ def get_client_emails(
 ):
     """Get all emails for a client"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     emails = db.query(ClientEmail).filter(
         ClientEmail.client_id == client_id
@@ -57,12 +53,7 @@ def add_client_email(
 ):
     """Add a new email"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     # Check duplicate
     existing = db.query(ClientEmail).filter(
@@ -118,12 +109,7 @@ def edit_client_email(
 ):
     """Edit an email - works for both modal and inline editing"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     email_record = db.query(ClientEmail).filter(
         ClientEmail.id == email_id,
@@ -153,8 +139,6 @@ def edit_client_email(
     for field, value in update_data.items():
         setattr(email_record, field, value)
     
-    email_record.updated_at = datetime.now(timezone.utc)
-    
     db.commit()
     db.refresh(email_record)
     
@@ -186,12 +170,7 @@ def delete_client_email(
 ):
     """Delete an email"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     email_record = db.query(ClientEmail).filter(
         ClientEmail.id == email_id,
@@ -214,12 +193,7 @@ def bulk_upload_emails(
     db: Session = Depends(get_db)
 ):
 
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     webhook_url = "https://obscureiq.app.n8n.cloud/webhook/54db872b-e2e7-4b81-9d94-01ca7e62428c"
 
@@ -233,7 +207,7 @@ def bulk_upload_emails(
         response = requests.post(webhook_url, json=payload, timeout=30)
 
         try:
-            n8n_result = response.json()
+            n8n_result = orjson.loads(response.content)
         except ValueError:
             raise HTTPException(
                 status_code=500,
@@ -1,18 +1,24 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, contains_eager
 import uuid
-import requests
+import httpx
+import orjson
 
 from database import get_db
 from models import Client, ClientGeneratedDocument, User
 from users import get_current_user
+from deps import get_authorized_record
+from webhooks import WebhookUnavailable, post_webhook
 
 router = APIRouter()
 
+DELETE_DOCUMENT_WEBHOOK_URL = "https://obscureiq.app.n8n.cloud/webhook/a8e03ae5-3830-4f54-a921-e9d61f18a8eb"
+ADMIN_DELETE_DOCUMENT_WEBHOOK_URL = "https://obscureiq.app.n8n.cloud/webhook-test/a8e03ae5-3830-4f54-a921-e9d61f18a8eb"
+
 def _validate_client_access(client_id: uuid.UUID, current_user: User, db: Session) -> Client:
     """Validate client exists and user has access"""
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = db.get(Client, client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
@@ -21,6 +27,59 @@ def _validate_client_access(client_id: uuid.UUID, current_user: User, db: Sessio
     
     return client
 
+def _delete_record(db: Session, document) -> None:
+    """Remove a document row once Google Drive has dropped the file"""
+    db.delete(document)
+    db.commit()
+
+async def _delete_document(db: Session, document, webhook_url: str) -> dict:
+    """Delete a document from Google Drive through n8n, then from the database once that succeeded"""
+    document_id = document.id
+    payload = orjson.dumps({
+        "document_id": str(document_id),
+        "view_url": document.view_url,
+        "file_name": document.file_name
+    })
+    
+    # Send to webhook first, over the pooled keep-alive client; not retried, as n8n may have acted before a gateway error
+    try:
+        status_code, body = await post_webhook(webhook_url, payload, retry=False)
+    except WebhookUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except httpx.HTTPError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to connect to Google Drive: {str(e)}"
+        )
+    
+    if status_code != 200:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Webhook failed with status {status_code}"
+        )
+    
+    try:
+        webhook_data = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error deleting document: {str(e)}"
+        )
+    
+    if webhook_data.get("status") != "Success":
+        raise HTTPException(
+            status_code=400,
+            detail=f"Failed to delete from Google Drive: {webhook_data.get('message', 'Unknown error')}"
+        )
+    
+    # Only delete from database if webhook succeeded
+    await run_in_threadpool(_delete_record, db, document)
+    
+    return {
+        "message": "Document deleted successfully",
+        "document_id": str(document_id)
+    }
+
 @router.get("/clients/{client_id}/documents", tags=["Generated Documents"])
 def get_client_generated_documents(
     client_id: uuid.UUID,
@@ -56,69 +115,18 @@ def get_client_generated_documents(
     }
 
 @router.delete("/clients/{client_id}/documents/{document_id}", tags=["Generated Documents"])
-def delete_generated_document(
+async def delete_generated_document(
     client_id: uuid.UUID,
     document_id: uuid.UUID,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a generated document from database and Google Drive"""
-    client = _validate_client_access(client_id, current_user, db)
-    
-    # Find the document
-    document = db.query(ClientGeneratedDocument).filter(
-        ClientGeneratedDocument.id == document_id,
-        ClientGeneratedDocument.client_id == client_id
-    ).first()
-    
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    # Send to webhook to delete from Google Drive
-    webhook_url = "https://obscureiq.app.n8n.cloud/webhook/a8e03ae5-3830-4f54-a921-e9d61f18a8eb"
+    document = await run_in_threadpool(
+        get_authorized_record, db, ClientGeneratedDocument, document_id, client_id, current_user, "Document not found"
+    )
     
-    payload = {
-        "document_id": str(document_id),
-        "view_url": document.view_url,
-        "file_name": document.file_name
-    }
-    
-    try:
-        # Send to webhook first
-        response = requests.post(webhook_url, json=payload, timeout=30)
-        
-        if response.status_code == 200:
-            webhook_data = response.json()
-            if webhook_data.get("status") == "Success":
-                # Only delete from database if webhook succeeded
-                db.delete(document)
-                db.commit()
-                
-                return {
-                    "message": "Document deleted successfully",
-                    "document_id": str(document_id)
-                }
-            else:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Failed to delete from Google Drive: {webhook_data.get('message', 'Unknown error')}"
-                )
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Webhook failed with status {response.status_code}"
-            )
-        
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to connect to Google Drive: {str(e)}"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error deleting document: {str(e)}"
-        )
+    return await _delete_document(db, document, DELETE_DOCUMENT_WEBHOOK_URL)
 
 @router.get("/admin/all-documents", tags=["Generated Documents"])
 def get_all_generated_documents(
@@ -129,7 +137,10 @@ def get_all_generated_documents(
     if current_user.role != "Admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    documents = db.query(ClientGeneratedDocument).join(Client).order_by(
+    # Populate doc.client from the join instead of one lazy SELECT per document
+    documents = db.query(ClientGeneratedDocument).join(Client).options(
+        contains_eager(ClientGeneratedDocument.client)
+    ).order_by(
         ClientGeneratedDocument.created_at.desc()
     ).all()
     
@@ -156,7 +167,7 @@ def get_all_generated_documents(
     }
 
 @router.delete("/admin/documents/{document_id}", tags=["Generated Documents"])
-def admin_delete_generated_document(
+async def admin_delete_generated_document(
     document_id: uuid.UUID,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -166,55 +177,9 @@ def admin_delete_generated_document(
         raise HTTPException(status_code=403, detail="Admin access required")
     
     # Find the document
-    document = db.query(ClientGeneratedDocument).filter(
-        ClientGeneratedDocument.id == document_id
-    ).first()
+    document = await run_in_threadpool(db.get, ClientGeneratedDocument, document_id)
     
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Send to webhook to delete from Google Drive
-    webhook_url = "https://obscureiq.app.n8n.cloud/webhook-test/a8e03ae5-3830-4f54-a921-e9d61f18a8eb"
-    
-    payload = {
-        "document_id": str(document_id),
-        "view_url": document.view_url,
-        "file_name": document.file_name
-    }
-    
-    try:
-        # Send to webhook first
-        response = requests.post(webhook_url, json=payload, timeout=30)
-        
-        if response.status_code == 200:
-            webhook_data = response.json()
-            if webhook_data.get("status") == "Success":
-                # Only delete from database if webhook succeeded
-                db.delete(document)
-                db.commit()
-                
-                return {
-                    "message": "Document deleted successfully",
-                    "document_id": str(document_id)
-                }
-            else:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Failed to delete from Google Drive: {webhook_data.get('message', 'Unknown error')}"
-                )
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Webhook failed with status {response.status_code}"
-            )
-        
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to connect to Google Drive: {str(e)}"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error deleting document: {str(e)}"
-        )
+    return await _delete_document(db, document, ADMIN_DELETE_DOCUMENT_WEBHOOK_URL)
@@ -1,15 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime, timezone, date
 from pathlib import Path
 import uuid
-import shutil
-import os
+from secrets import token_hex
 
 from database import get_db
 from models import (
-    Client, ClientDonorRecord, ClientVoterRecord, ClientDVMRecord, 
+    ClientDonorRecord, ClientVoterRecord, ClientDVMRecord, 
     ClientGovRecord, User
 )
 from schemas import (
@@ -19,7 +17,9 @@ from schemas import (
     GovRecordCreate, GovRecordUpdate, GovRecordResponse
 )
 from users import get_current_user
-BASE_URL = "https://obsecureiqbackendv1-production-e750.up.railway.app"
+from deps import authorize_client
+from uploads import save_upload
+from urls import client_image_url
 
 router = APIRouter()
 
@@ -37,12 +37,7 @@ def get_client_donor_records(
 ):
     """Get all donor records for a client"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     donor_records = db.query(ClientDonorRecord).filter(
         ClientDonorRecord.client_id == client_id
@@ -59,12 +54,7 @@ def add_client_donor_record(
 ):
     """Add a single donor record manually (no CSV file)"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     # Validate required fields
     if not donor_data.contributor_name or not donor_data.contributor_name.strip():
@@ -98,24 +88,18 @@ def upload_donor_csv(
 ):
     """Upload CSV file - creates a record with CSV file path only"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     if not csv_file:
         raise HTTPException(status_code=400, detail="CSV file is required")
     
     # Save CSV file to disk
     file_extension = Path(csv_file.filename).suffix.lower() if csv_file.filename else ".csv"
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
+    unique_filename = f"{token_hex(16)}{file_extension}"
     csv_file_path = UPLOAD_DIR / unique_filename
     
     try:
-        with csv_file_path.open("wb") as buffer:
-            shutil.copyfileobj(csv_file.file, buffer)
+        save_upload(csv_file, csv_file_path)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -123,7 +107,7 @@ def upload_donor_csv(
         )
     
     # Create complete CSV file URL
-    csv_file_url = f"{BASE_URL}/uploads/client_images/{unique_filename}"
+    csv_file_url = client_image_url(unique_filename)
     
     # Create a record with just the CSV file
     new_record = ClientDonorRecord(
@@ -165,12 +149,7 @@ def update_client_donor_record(
 ):
     """Update a donor record - works for both manual and CSV records"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     donor_record = db.query(ClientDonorRecord).filter(
         ClientDonorRecord.id == donor_id,
@@ -194,8 +173,6 @@ def update_client_donor_record(
             detail="No updates provided"
         )
     
-    donor_record.updated_at = datetime.now(timezone.utc)
-    
     db.commit()
     db.refresh(donor_record)
     
@@ -210,12 +187,7 @@ def delete_client_donor_record(
 ):
     """Delete a donor record and associated CSV file if exists"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     donor_record = db.query(ClientDonorRecord).filter(
         ClientDonorRecord.id == donor_id,
@@ -250,12 +222,7 @@ def get_client_voter_records(
 ):
     """Get all voter records for a client"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     voter_records = db.query(ClientVoterRecord).filter(
         ClientVoterRecord.client_id == client_id
@@ -272,12 +239,7 @@ def add_client_voter_record(
 ):
     """Add a new voter record"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     # Validate required field
     if not voter_data.voter_record or not voter_data.voter_record.strip():
@@ -305,12 +267,7 @@ def update_client_voter_record(
 ):
     """Update a voter record"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     voter_record = db.query(ClientVoterRecord).filter(
         ClientVoterRecord.id == voter_id,
@@ -325,7 +282,6 @@ def update_client_voter_record(
         raise HTTPException(status_code=400, detail="Voter record cannot be empty")
     
     voter_record.voter_record = voter_data.voter_record
-    voter_record.updated_at = datetime.now(timezone.utc)
     
     db.commit()
     db.refresh(voter_record)
@@ -341,12 +297,7 @@ def delete_client_voter_record(
 ):
     """Delete a voter record"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     voter_record = db.query(ClientVoterRecord).filter(
         ClientVoterRecord.id == voter_id,
@@ -370,12 +321,7 @@ def get_client_dvm_records(
     db: Session = Depends(get_db)
 ):
     """Get all DVM records for a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     dvm_records = db.query(ClientDVMRecord).filter(
         ClientDVMRecord.client_id == client_id
@@ -391,12 +337,7 @@ def add_client_dvm_record(
     db: Session = Depends(get_db)
 ):
     """Add a new DVM record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     if not dvm_data.dvm_record.strip():
         raise HTTPException(status_code=400, detail="DVM record is required")
@@ -421,12 +362,7 @@ def update_client_dvm_record(
     db: Session = Depends(get_db)
 ):
     """Update a DVM record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     dvm_record = db.query(ClientDVMRecord).filter(
         ClientDVMRecord.id == dvm_id,
@@ -438,7 +374,6 @@ def update_client_dvm_record(
 
     if dvm_data.dvm_record and dvm_data.dvm_record.strip():
         dvm_record.dvm_record = dvm_data.dvm_record
-        dvm_record.updated_at = datetime.now(timezone.utc)
         db.commit()
         db.refresh(dvm_record)
     else:
@@ -454,12 +389,7 @@ def delete_client_dvm_record(
     db: Session = Depends(get_db)
 ):
     """Delete a DVM record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     dvm_record = db.query(ClientDVMRecord).filter(
         ClientDVMRecord.id == dvm_id,
@@ -483,12 +413,7 @@ def get_gov_records(
     db: Session = Depends(get_db)
 ):
     """Get all government records for a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     records = db.query(ClientGovRecord).filter(
         ClientGovRecord.client_id == client_id
@@ -504,12 +429,7 @@ def add_gov_record(
     db: Session = Depends(get_db)
 ):
     """Add a new government record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     if not data.record_type.strip() or not data.record.strip():
         raise HTTPException(status_code=400, detail="Both record_type and record are required")
@@ -535,12 +455,7 @@ def update_gov_record(
     db: Session = Depends(get_db)
 ):
     """Update a government record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     record = db.query(ClientGovRecord).filter(
         ClientGovRecord.id == record_id,
@@ -564,8 +479,6 @@ def update_gov_record(
     for field, value in update_fields.items():
         setattr(record, field, value)
 
-    record.updated_at = datetime.now(timezone.utc)
-
     db.commit()
     db.refresh(record)
 
@@ -579,12 +492,7 @@ def delete_gov_record(
     db: Session = Depends(get_db)
 ):
     """Delete a government record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     record = db.query(ClientGovRecord).filter(
         ClientGovRecord.id == record_id,
@@ -4,9 +4,10 @@ from typing import List
 import uuid
 
 from database import get_db
-from models import Client, ClientMatchingResult, User
+from models import ClientMatchingResult, User
 from schemas import ClientMatchingResultResponse
 from users import get_current_user
+from deps import authorize_client
 
 router = APIRouter()
 
@@ -18,12 +19,7 @@ def get_client_matching_results(
 ):
     """Get all matching results for a client"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     matching_results = db.query(ClientMatchingResult).filter(
         ClientMatchingResult.client_id == client_id
@@ -41,12 +37,7 @@ def delete_client_matching_result(
 ):
     """Delete a matching result"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
     
     matching_result = db.query(ClientMatchingResult).filter(
         ClientMatchingResult.id == result_id,
@@ -1,18 +1,26 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime, timezone
 import uuid
-import requests
+import orjson
+import os
 import re
 
 from database import get_db
-from models import Client, ClientPhoneNumber, User
+from models import ClientPhoneNumber, User
 from schemas import PhoneNumberCreate, PhoneNumberUpdate, PhoneNumberResponse, BulkPhoneUpload
 from users import get_current_user
+from deps import get_authorized_record, require_client_access
+from webhooks import WebhookUnavailable, post_json_webhook
 
 router = APIRouter()
 
+PHONE_WEBHOOK_URL = "https://obscureiq.app.n8n.cloud/webhook/92457ed2-aad5-4981-b88c-cd65f11b3a8b"
+
+# Pastes up to this many lines are inserted directly instead of going through n8n
+BULK_LOCAL_THRESHOLD = int(os.getenv("BULK_LOCAL_THRESHOLD", "100"))
+
 def clean_phone_number(phone: str) -> str:
     """Clean and normalize phone number by removing formatting characters"""
     # Remove all characters except digits and +
@@ -24,21 +32,32 @@ def clean_phone_number(phone: str) -> str:
     
     return cleaned
 
+def _insert_phone_numbers(db: Session, client_id: uuid.UUID, phone_numbers: List[str], client_provided: str) -> int:
+    """Insert normalized phone numbers directly, skipping existing ones. Returns the number added"""
+    existing = {
+        row.phone_number for row in db.query(ClientPhoneNumber.phone_number).filter(
+            ClientPhoneNumber.client_id == client_id,
+            ClientPhoneNumber.phone_number.in_(phone_numbers)
+        )
+    }
+    
+    new_phones = [
+        ClientPhoneNumber(client_id=client_id, phone_number=phone, client_provided=client_provided)
+        for phone in dict.fromkeys(phone_numbers)
+        if phone not in existing
+    ]
+    
+    db.add_all(new_phones)
+    db.commit()
+    return len(new_phones)
+
 @router.get("/clients/{client_id}/phone-numbers", response_model=List[PhoneNumberResponse], tags=["Client Phone Numbers"])
 def get_client_phone_numbers(
-    client_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
     """Get all phone numbers for a client"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
     phone_numbers = db.query(ClientPhoneNumber).filter(
         ClientPhoneNumber.client_id == client_id
     ).order_by(ClientPhoneNumber.created_at.desc()).all()
@@ -47,27 +66,12 @@ def get_client_phone_numbers(
 
 @router.post("/clients/{client_id}/phone-numbers", response_model=PhoneNumberResponse, tags=["Client Phone Numbers"])
 def add_client_phone_number(
-    client_id: uuid.UUID,
     phone_data: PhoneNumberCreate,
-    current_user: User = Depends(get_current_user),
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
     """Add a new phone number"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Validate client_provided value (only if provided and not empty)
-    if phone_data.client_provided is not None and phone_data.client_provided.strip() and phone_data.client_provided not in ["Yes", "No"]:
-        raise HTTPException(
-            status_code=400, 
-            detail="client_provided must be 'Yes' or 'No'"
-        )
-    
     # Clean and normalize phone number
     phone_number = clean_phone_number(phone_data.phone_number)
     
@@ -103,27 +107,9 @@ def edit_client_phone_number(
 ):
     """Edit a phone number - works for both modal and inline editing"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    phone_record = db.query(ClientPhoneNumber).filter(
-        ClientPhoneNumber.id == phone_id,
-        ClientPhoneNumber.client_id == client_id
-    ).first()
-    
-    if not phone_record:
-        raise HTTPException(status_code=404, detail="Phone number not found")
-    
-    # Validate client_provided if being updated
-    if phone_data.client_provided is not None and phone_data.client_provided.strip() and phone_data.client_provided not in ["Yes", "No"]:
-        raise HTTPException(
-            status_code=400, 
-            detail="client_provided must be 'Yes' or 'No'"
-        )
+    phone_record = get_authorized_record(
+        db, ClientPhoneNumber, phone_id, client_id, current_user, "Phone number not found"
+    )
     
     # Clean and normalize phone number if being changed
     if phone_data.phone_number:
@@ -146,8 +132,6 @@ def edit_client_phone_number(
     if phone_data.client_provided is not None:
         phone_record.client_provided = phone_data.client_provided
     
-    phone_record.updated_at = datetime.now(timezone.utc)
-    
     db.commit()
     db.refresh(phone_record)
     
@@ -155,49 +139,31 @@ def edit_client_phone_number(
 
 @router.delete("/clients/{client_id}/phone-numbers/{phone_id}", tags=["Client Phone Numbers"])
 def delete_client_phone_number(
-    client_id: uuid.UUID,
     phone_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
     """Delete a phone number"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    phone_record = db.query(ClientPhoneNumber).filter(
+    deleted = db.query(ClientPhoneNumber).filter(
         ClientPhoneNumber.id == phone_id,
         ClientPhoneNumber.client_id == client_id
-    ).first()
+    ).delete(synchronize_session=False)
     
-    if not phone_record:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Phone number not found")
     
-    db.delete(phone_record)
     db.commit()
     
     return {"message": "Phone number deleted successfully"}
 
 @router.post("/clients/{client_id}/phone-numbers/bulk-upload", tags=["Client Phone Numbers"])
-def bulk_upload_phone_numbers(
-    client_id: uuid.UUID,
+async def bulk_upload_phone_numbers(
     bulk_data: BulkPhoneUpload,
-    current_user: User = Depends(get_current_user),
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
-    """Send raw phone numbers directly to webhook and return real n8n result"""
-    
-    # Check client access
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    """Insert small pastes directly; send larger ones to the n8n webhook and return its result"""
     
     # Clean and normalize phone numbers
     phone_lines = bulk_data.phone_numbers_text.strip().split('\n')
@@ -208,32 +174,42 @@ def bulk_upload_phone_numbers(
             cleaned_phone = clean_phone_number(phone)
             normalized_phones.append(cleaned_phone)
     
-    normalized_text = '\n'.join(normalized_phones)
+    # Small pastes are inserted directly - no webhook round-trip needed
+    if len(normalized_phones) <= BULK_LOCAL_THRESHOLD:
+        added_count = await run_in_threadpool(
+            _insert_phone_numbers, db, client_id, normalized_phones, bulk_data.client_provided
+        )
+        if not added_count:
+            raise HTTPException(status_code=400, detail="Phone numbers already exist")
+        
+        return {
+            "status": "success",
+            "message": f"{added_count} phone number(s) added successfully"
+        }
     
-    webhook_url = "https://obscureiq.app.n8n.cloud/webhook/92457ed2-aad5-4981-b88c-cd65f11b3a8b"
+    normalized_text = '\n'.join(normalized_phones)
     
-    payload = {
+    payload = orjson.dumps({
         "phone_number": normalized_text,
         "client_id": str(client_id),
         "client_provided": bulk_data.client_provided
-    }
+    })
     
     try:
-        response = requests.post(webhook_url, json=payload, timeout=60)
-
         # response from n8n (JSON only because responseMode="responseNode")
-        n8n_result = response.json()
-
-        if n8n_result.get("success") is True:
-            return {
-                "status": "success",
-                "message": n8n_result.get("message", "Phone numbers added successfully")
-            }
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=n8n_result.get("message", "Failed to insert phone numbers")
-            )
-
+        n8n_result = await post_json_webhook(PHONE_WEBHOOK_URL, payload)
+    except WebhookUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    if n8n_result.get("success") is True:
+        return {
+            "status": "success",
+            "message": n8n_result.get("message", "Phone numbers added successfully")
+        }
+
+    raise HTTPException(
+        status_code=400,
+        detail=n8n_result.get("message", "Failed to insert phone numbers")
+    )
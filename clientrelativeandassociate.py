@@ -1,70 +1,89 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import exists, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime, timezone
 import uuid
-import requests
+import httpx
+import orjson
+import os
 
-from database import get_db
-from models import Client, ClientRelativeAssociate, User
+from database import get_async_db, get_db
+from models import ClientRelativeAssociate, User
 from schemas import RelativeAssociateCreate, RelativeAssociateUpdate, RelativeAssociateResponse, BulkRelativeUpload
 from users import get_current_user
+from deps import authorize_client_async, get_authorized_record, require_client_access
+from webhooks import WebhookUnavailable, post_json_webhook
 
 router = APIRouter()
 
+# Only the columns the list response serializes
+RELATIVE_COLUMNS = [getattr(ClientRelativeAssociate, field) for field in RelativeAssociateResponse.model_fields]
+
+RELATIVES_WEBHOOK_URL = "https://obscureiq.app.n8n.cloud/webhook/a68f0e08-aa20-470d-b0e5-fbda8968d7e2"
+
+# Pastes up to this many lines are inserted directly instead of going through n8n
+BULK_LOCAL_THRESHOLD = int(os.getenv("BULK_LOCAL_THRESHOLD", "100"))
+
+def _insert_relatives(db: Session, client_id: uuid.UUID, names: List[str], relationship_type: str) -> bool:
+    """Insert names directly in one statement, skipping existing ones. Returns True if any row was added"""
+    existing_names = {
+        name for (name,) in db.query(func.lower(func.trim(ClientRelativeAssociate.name))).filter(
+            ClientRelativeAssociate.client_id == client_id
+        ).distinct()
+    }
+
+    rows = []
+    for name in names:
+        if name.lower() in existing_names:
+            continue
+
+        rows.append({"client_id": client_id, "name": name, "relationship_type": relationship_type})
+        existing_names.add(name.lower())
+
+    if rows:
+        db.execute(insert(ClientRelativeAssociate), rows)
+        db.commit()
+    return bool(rows)
+
 @router.get("/clients/{client_id}/relatives", response_model=List[RelativeAssociateResponse], tags=["Client Relatives & Associates"])
-def get_client_relatives(
+async def get_client_relatives(
     client_id: uuid.UUID,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all relatives and associates for a client"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    await authorize_client_async(db, client_id, current_user)
     
-    relatives = db.query(ClientRelativeAssociate).filter(
-        ClientRelativeAssociate.client_id == client_id
-    ).order_by(ClientRelativeAssociate.created_at.desc()).all()
+    result = await db.execute(
+        select(*RELATIVE_COLUMNS).where(
+            ClientRelativeAssociate.client_id == client_id
+        ).order_by(ClientRelativeAssociate.created_at.desc())
+    )
+    rows = result.all()
     
-    return relatives
+    # Rows come straight from the DB, so skip re-validation
+    return [RelativeAssociateResponse.model_construct(**row._mapping) for row in rows]
 
 @router.post("/clients/{client_id}/relatives", response_model=RelativeAssociateResponse, tags=["Client Relatives & Associates"])
 def add_client_relative(
-    client_id: uuid.UUID,
     relative_data: RelativeAssociateCreate,
-    current_user: User = Depends(get_current_user),
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
     """Add a new relative or associate"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Validate relationship_type (only if provided)
-    if relative_data.relationship_type and relative_data.relationship_type not in ["Relative", "Associate"]:
-        raise HTTPException(
-            status_code=400, 
-            detail="relationship_type must be 'Relative' or 'Associate'"
-        )
-    
     # Normalize and check duplicate name (case-insensitive)
     normalized_name = relative_data.name.strip()
-    existing = db.query(ClientRelativeAssociate).filter(
-        ClientRelativeAssociate.client_id == client_id
-    ).all()
+    duplicate = db.query(exists().where(
+        ClientRelativeAssociate.client_id == client_id,
+        func.lower(func.trim(ClientRelativeAssociate.name)) == normalized_name.lower()
+    )).scalar()
     
-    for record in existing:
-        if record.name.strip().lower() == normalized_name.lower():
-            raise HTTPException(status_code=400, detail="This relative/associate name already exists for this client")
+    if duplicate:
+        raise HTTPException(status_code=400, detail="This relative/associate name already exists for this client")
     
     # Create new relative/associate
     new_relative = ClientRelativeAssociate(
@@ -89,41 +108,23 @@ def edit_client_relative(
 ):
     """Edit a relative or associate - works for both modal and inline editing"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    relative_record = db.query(ClientRelativeAssociate).filter(
-        ClientRelativeAssociate.id == relative_id,
-        ClientRelativeAssociate.client_id == client_id
-    ).first()
-    
-    if not relative_record:
-        raise HTTPException(status_code=404, detail="Relative/Associate not found")
-    
-    # Validate relationship_type if being updated
-    if relative_data.relationship_type and relative_data.relationship_type not in ["Relative", "Associate"]:
-        raise HTTPException(
-            status_code=400, 
-            detail="relationship_type must be 'Relative' or 'Associate'"
-        )
+    relative_record = get_authorized_record(
+        db, ClientRelativeAssociate, relative_id, client_id, current_user, "Relative/Associate not found"
+    )
     
     # Check duplicate if name is being changed (case-insensitive)
     if relative_data.name:
         normalized_name = relative_data.name.strip()
         
         if normalized_name.lower() != relative_record.name.strip().lower():
-            existing = db.query(ClientRelativeAssociate).filter(
+            duplicate = db.query(exists().where(
                 ClientRelativeAssociate.client_id == client_id,
-                ClientRelativeAssociate.id != relative_id
-            ).all()
+                ClientRelativeAssociate.id != relative_id,
+                func.lower(func.trim(ClientRelativeAssociate.name)) == normalized_name.lower()
+            )).scalar()
             
-            for record in existing:
-                if record.name.strip().lower() == normalized_name.lower():
-                    raise HTTPException(status_code=400, detail="This relative/associate name already exists for this client")
+            if duplicate:
+                raise HTTPException(status_code=400, detail="This relative/associate name already exists for this client")
         
         relative_record.name = normalized_name
     
@@ -131,8 +132,6 @@ def edit_client_relative(
     if relative_data.relationship_type is not None:
         relative_record.relationship_type = relative_data.relationship_type
     
-    relative_record.updated_at = datetime.now(timezone.utc)
-    
     db.commit()
     db.refresh(relative_record)
     
@@ -140,137 +139,105 @@ def edit_client_relative(
 
 @router.delete("/clients/{client_id}/relatives/{relative_id}", tags=["Client Relatives & Associates"])
 def delete_client_relative(
-    client_id: uuid.UUID,
     relative_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
     """Delete a relative or associate"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    relative_record = db.query(ClientRelativeAssociate).filter(
+    deleted = db.query(ClientRelativeAssociate).filter(
         ClientRelativeAssociate.id == relative_id,
         ClientRelativeAssociate.client_id == client_id
-    ).first()
+    ).delete(synchronize_session=False)
     
-    if not relative_record:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Relative/Associate not found")
     
-    db.delete(relative_record)
     db.commit()
     
     return {"message": "Relative/Associate deleted successfully"}
 
 @router.post("/clients/{client_id}/relatives/bulk-upload", tags=["Client Relatives & Associates"])
-def bulk_upload_relatives(
-    client_id: uuid.UUID,
+async def bulk_upload_relatives(
     bulk_data: BulkRelativeUpload,
-    current_user: User = Depends(get_current_user),
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-
     relationship_type = bulk_data.relationship_type or "Associate"
-    if relationship_type not in ["Relative", "Associate"]:
-        raise HTTPException(
-            status_code=400,
-            detail="relationship_type must be 'Relative' or 'Associate'"
-        )
-
-    webhook_url = "https://obscureiq.app.n8n.cloud/webhook/a68f0e08-aa20-470d-b0e5-fbda8968d7e2"
-
-    payload = {
-        "relative_name": bulk_data.relatives_text,
-        "relationship_type": relationship_type,
-        "client_id": str(client_id)
-    }
-
-    try:
-        response = requests.post(webhook_url, json=payload, timeout=60)
-
-        try:
-            n8n_result = response.json()
-        except ValueError:
-            raise HTTPException(
-                status_code=500,
-                detail="Webhook did not return valid JSON"
-            )
-
-        # 🔁 FALLBACK: webhook inactive
-        if "detail" in n8n_result and "not registered" in str(n8n_result.get("detail", "")):
-            names = [
-                n.strip()
-                for n in bulk_data.relatives_text.split("\n")
-                if n.strip()
-            ]
-
-            existing_records = db.query(ClientRelativeAssociate).filter(
-                ClientRelativeAssociate.client_id == client_id
-            ).all()
-
-            existing_names = {
-                r.name.strip().lower() for r in existing_records
-            }
-
-            added_any = False
-
-            for name in names:
-                if name.lower() in existing_names:
-                    continue
-
-                db.add(ClientRelativeAssociate(
-                    client_id=client_id,
-                    name=name,
-                    relationship_type=relationship_type
-                ))
-                added_any = True
 
-            db.commit()
+    names = [
+        n.strip()
+        for n in bulk_data.relatives_text.split("\n")
+        if n.strip()
+    ]
 
-            if not added_any:
-                return {
-                    "success": False,
-                    "message": "Relatives already exist"
-                }
+    # Small pastes are inserted directly - no webhook round-trip needed
+    if len(names) <= BULK_LOCAL_THRESHOLD:
+        added_any = await run_in_threadpool(_insert_relatives, db, client_id, names, relationship_type)
 
+        if not added_any:
             return {
-                "success": True,
-                "message": "Relatives added successfully"
+                "success": False,
+                "message": "Relatives already exist"
             }
 
-        # ✅ NORMAL n8n RESPONSE
-        success = n8n_result.get("success")
+        return {
+            "success": True,
+            "message": "Relatives added successfully"
+        }
 
-        if success is True:
-            return {
-                "success": True,
-                "message": n8n_result.get("message", "Relatives added successfully")
-            }
-
-        if success is False:
-            return {
-                "success": False,
-                "message": n8n_result.get("message", "Relatives already exist")
-            }
+    payload = orjson.dumps({
+        "relative_name": bulk_data.relatives_text,
+        "relationship_type": relationship_type,
+        "client_id": str(client_id)
+    })
 
+    try:
+        n8n_result = await post_json_webhook(RELATIVES_WEBHOOK_URL, payload)
+    except WebhookUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError:
         raise HTTPException(
             status_code=500,
-            detail="Unexpected webhook response"
+            detail="Webhook did not return valid JSON"
         )
-
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         raise HTTPException(
             status_code=500,
             detail=f"Webhook connection error: {str(e)}"
         )
+
+    # 🔁 FALLBACK: webhook inactive
+    if "detail" in n8n_result and "not registered" in str(n8n_result.get("detail", "")):
+        added_any = await run_in_threadpool(_insert_relatives, db, client_id, names, relationship_type)
+
+        if not added_any:
+            return {
+                "success": False,
+                "message": "Relatives already exist"
+            }
+
+        return {
+            "success": True,
+            "message": "Relatives added successfully"
+        }
+
+    # ✅ NORMAL n8n RESPONSE
+    success = n8n_result.get("success")
+
+    if success is True:
+        return {
+            "success": True,
+            "message": n8n_result.get("message", "Relatives added successfully")
+        }
+
+    if success is False:
+        return {
+            "success": False,
+            "message": n8n_result.get("message", "Relatives already exist")
+        }
+
+    raise HTTPException(
+        status_code=500,
+        detail="Unexpected webhook response"
+    )
@@ -1,64 +1,83 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime, timezone
 from pathlib import Path
+import asyncio
 import uuid
-import shutil
-import os
 
-from database import get_db
-from models import Client, ClientResidentialHeatmapImage, User
+from database import get_async_db, get_db
+from models import ClientResidentialHeatmapImage, User
 from schemas import ResidentialHeatmapImageResponse
 from users import get_current_user
+from deps import authorize_client_async, get_authorized_record, require_client_access
+from uploads import safe_unlink, store_upload, validate_image
+from urls import client_image_url
 
 router = APIRouter()
-BASE_URL = "https://obsecureiqbackendv1-production-e750.up.railway.app"
+
+# Only the columns the list response serializes
+IMAGE_COLUMNS = [getattr(ClientResidentialHeatmapImage, field) for field in ResidentialHeatmapImageResponse.model_fields]
 
 # Upload directory setup
 UPLOAD_DIR = Path("uploads/client_images")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+UPLOAD_STR = str(UPLOAD_DIR)
 
 @router.get("/clients/{client_id}/residential-heatmap-images", response_model=List[ResidentialHeatmapImageResponse], tags=["Client Residential & Heatmap"])
-def get_client_residential_heatmap_images(
+async def get_client_residential_heatmap_images(
     client_id: uuid.UUID,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all residential and heatmap images for a client"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
+    await authorize_client_async(db, client_id, current_user)
     
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    result = await db.execute(
+        select(*IMAGE_COLUMNS).where(
+            ClientResidentialHeatmapImage.client_id == client_id
+        ).order_by(ClientResidentialHeatmapImage.created_at.desc())
+    )
+    rows = result.all()
     
-    images = db.query(ClientResidentialHeatmapImage).filter(
-        ClientResidentialHeatmapImage.client_id == client_id
-    ).order_by(ClientResidentialHeatmapImage.created_at.desc()).all()
-    
-    return images
+    # Rows come straight from the DB, so skip re-validation
+    return [ResidentialHeatmapImageResponse.model_construct(**row._mapping) for row in rows]
+
+async def _save_image(image: UploadFile) -> str:
+    """Save one uploaded image under a unique name in the threadpool and return the filename"""
+    try:
+        return await run_in_threadpool(store_upload, image, UPLOAD_STR)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to save image {image.filename}: {str(e)}"
+        )
+
+def _insert_images(db: Session, rows: List[dict]) -> list:
+    """Insert all image records in one statement, returning (id, created_at) in row order"""
+    result = db.execute(
+        insert(ClientResidentialHeatmapImage).returning(
+            ClientResidentialHeatmapImage.id,
+            ClientResidentialHeatmapImage.created_at,
+            sort_by_parameter_order=True
+        ),
+        rows
+    ).all()
+    db.commit()
+    return result
 
 @router.post("/clients/{client_id}/residential-heatmap-images", tags=["Client Residential & Heatmap"])
-def upload_client_residential_heatmap_images(
-    client_id: uuid.UUID,
+async def upload_client_residential_heatmap_images(
     image_type: str = Form(...),  # Required - from dropdown
     images: List[UploadFile] = File(...),  # Multiple image files
-    current_user: User = Depends(get_current_user),
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
     """Upload multiple residential/heatmap images for a client"""
     
-    # Check if client exists
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    # Check access rights
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
     # Validate image_type
     if not image_type or not image_type.strip():
         raise HTTPException(status_code=400, detail="Image type is required")
@@ -67,51 +86,36 @@ def upload_client_residential_heatmap_images(
     if not images or len(images) == 0:
         raise HTTPException(status_code=400, detail="At least one image is required")
     
-    uploaded_images = []
-    
+    # Reject the whole request before any disk write if one file is invalid
     for image in images:
-        # Get file extension (keep original extension)
-        file_extension = Path(image.filename).suffix.lower() if image.filename else ".jpg"
-        
-        # Generate unique filename
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = UPLOAD_DIR / unique_filename
-        
-        # Save file to disk
-        try:
-            with file_path.open("wb") as buffer:
-                shutil.copyfileobj(image.file, buffer)
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to save image {image.filename}: {str(e)}"
-            )
-        
-        # Create complete image URL for database
-      
-        image_url = f"{BASE_URL}/uploads/client_images/{unique_filename}"
-        
-        # Create database record for each image
-        new_image = ClientResidentialHeatmapImage(
-            client_id=client_id,
-            image_type=image_type,
-            image_url=image_url
-        )
-        
-        db.add(new_image)
-        db.flush()  # Get the ID without committing yet
-        
-        uploaded_images.append({
-            "id": str(new_image.id),
+        validate_image(image)
+    
+    # Write all files concurrently rather than one after another
+    filenames = await asyncio.gather(*[_save_image(image) for image in images])
+    
+    rows = [
+        {
+            "client_id": client_id,
+            "image_type": image_type,
+            "image_url": client_image_url(unique_filename)
+        }
+        for unique_filename in filenames
+    ]
+    
+    # Insert all records at once
+    inserted = await run_in_threadpool(_insert_images, db, rows)
+    
+    uploaded_images = [
+        {
+            "id": str(image_id),
             "client_id": str(client_id),
             "image_type": image_type,
-            "image_url": image_url,
+            "image_url": row["image_url"],
             "original_filename": image.filename,
-            "created_at": new_image.created_at.isoformat()
-        })
-    
-    # Commit all records at once
-    db.commit()
+            "created_at": created_at.isoformat()
+        }
+        for (image_id, created_at), row, image in zip(inserted, rows, images)
+    ]
     
     return {
         "success": True,
@@ -123,6 +127,7 @@ def upload_client_residential_heatmap_images(
 def update_client_residential_heatmap_image(
     client_id: uuid.UUID,
     image_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     image_type: str = Form(None),  # Optional - update image type
     image: UploadFile = File(None),  # Optional - replace image file
     current_user: User = Depends(get_current_user),
@@ -130,23 +135,9 @@ def update_client_residential_heatmap_image(
 ):
     """Update image type or replace image file"""
     
-    # Check if client exists
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    # Check access rights
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Get existing image record
-    image_record = db.query(ClientResidentialHeatmapImage).filter(
-        ClientResidentialHeatmapImage.id == image_id,
-        ClientResidentialHeatmapImage.client_id == client_id
-    ).first()
-    
-    if not image_record:
-        raise HTTPException(status_code=404, detail="Image not found")
+    image_record = get_authorized_record(
+        db, ClientResidentialHeatmapImage, image_id, client_id, current_user, "Image not found"
+    )
     
     # Track if anything was updated
     updated = False
@@ -159,17 +150,11 @@ def update_client_residential_heatmap_image(
     
     # Replace image file if provided
     if image is not None:
-        # Get file extension (keep original extension)
-        file_extension = Path(image.filename).suffix.lower() if image.filename else ".jpg"
+        validate_image(image)
         
-        # Generate new unique filename
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        new_file_path = UPLOAD_DIR / unique_filename
-        
-        # Save new file to disk
+        # Save new file to disk under a new unique filename
         try:
-            with new_file_path.open("wb") as buffer:
-                shutil.copyfileobj(image.file, buffer)
+            unique_filename = store_upload(image, UPLOAD_STR)
         except Exception as e:
             raise HTTPException(
                 status_code=500,
@@ -177,18 +162,12 @@ def update_client_residential_heatmap_image(
             )
         
         # Update image URL in database with complete URL
-        new_image_url = f"{BASE_URL}/uploads/client_images/{unique_filename}"
+        new_image_url = client_image_url(unique_filename)
         image_record.image_url = new_image_url
         updated = True
         
-        # Delete old physical file (after new file is saved successfully)
-        try:
-            old_filename = Path(old_image_url).name
-            old_file_path = UPLOAD_DIR / old_filename
-            if old_file_path.exists():
-                old_file_path.unlink()
-        except Exception as e:
-            print(f"Warning: Could not delete old file: {str(e)}")
+        # Delete old physical file after the response is sent
+        background_tasks.add_task(safe_unlink, UPLOAD_DIR / Path(old_image_url).name)
     
     # Check if anything was actually updated
     if not updated:
@@ -197,9 +176,6 @@ def update_client_residential_heatmap_image(
             detail="No updates provided. Please provide image_type or image file to update."
         )
     
-    # Update timestamp
-    image_record.updated_at = datetime.now(timezone.utc)
-    
     db.commit()
     db.refresh(image_record)
     
@@ -218,41 +194,27 @@ def update_client_residential_heatmap_image(
 
 @router.delete("/clients/{client_id}/residential-heatmap-images/{image_id}", tags=["Client Residential & Heatmap"])
 def delete_client_residential_heatmap_image(
-    client_id: uuid.UUID,
     image_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    background_tasks: BackgroundTasks,
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
     """Delete a residential/heatmap image"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    image_record = db.query(ClientResidentialHeatmapImage).filter(
-        ClientResidentialHeatmapImage.id == image_id,
-        ClientResidentialHeatmapImage.client_id == client_id
+    # Delete from database, returning the URL so the file can be removed
+    row = db.execute(
+        delete(ClientResidentialHeatmapImage).where(
+            ClientResidentialHeatmapImage.id == image_id,
+            ClientResidentialHeatmapImage.client_id == client_id
+        ).returning(ClientResidentialHeatmapImage.image_url)
     ).first()
     
-    if not image_record:
+    if not row:
         raise HTTPException(status_code=404, detail="Image not found")
     
-    # Delete physical file from disk
-    try:
-        filename = Path(image_record.image_url).name
-        file_path = UPLOAD_DIR / filename
-        
-        if file_path.exists():
-            file_path.unlink()  # Delete the file
-    except Exception as e:
-        print(f"Warning: Could not delete physical file: {str(e)}")
-        # Continue anyway - delete from database even if file deletion fails
-    
-    # Delete from database
-    db.delete(image_record)
     db.commit()
     
+    # Delete physical file from disk after the response is sent
+    background_tasks.add_task(safe_unlink, UPLOAD_DIR / Path(row.image_url).name)
+    
     return {"message": "Image deleted successfully"}
@@ -1,57 +1,55 @@
 from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 import uuid
 
-from database import get_db
-from models import Client, ClientSerpAnalysis, User
+from database import get_async_db, get_db
+from models import ClientSerpAnalysis, User
 from schemas import SerpAnalysisResponse
 from users import get_current_user
+from deps import authorize_client_async, require_client_access
 
 router = APIRouter()
 
+# Only the columns the list response serializes
+SERP_COLUMNS = [getattr(ClientSerpAnalysis, field) for field in SerpAnalysisResponse.model_fields]
+
 @router.get("/clients/{client_id}/serp-analysis", response_model=List[SerpAnalysisResponse], tags=["SERP Analysis"])
-def get_serp_analysis(
+async def get_serp_analysis(
     client_id: uuid.UUID,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get SERP analysis for a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
+    await authorize_client_async(db, client_id, current_user)
 
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    result = await db.execute(
+        select(*SERP_COLUMNS).where(
+            ClientSerpAnalysis.client_id == client_id
+        ).order_by(ClientSerpAnalysis.created_at.desc())
+    )
+    rows = result.all()
 
-    return db.query(ClientSerpAnalysis).filter(
-        ClientSerpAnalysis.client_id == client_id
-    ).order_by(ClientSerpAnalysis.created_at.desc()).all()
+    # Rows come straight from the DB, so skip re-validation
+    return [SerpAnalysisResponse.model_construct(**row._mapping) for row in rows]
 
 @router.delete("/clients/{client_id}/serp-analysis/{analysis_id}", tags=["SERP Analysis"])
 def delete_serp_analysis(
-    client_id: uuid.UUID,
     analysis_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
     """Delete SERP analysis record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    record = db.query(ClientSerpAnalysis).filter(
+    deleted = db.query(ClientSerpAnalysis).filter(
         ClientSerpAnalysis.id == analysis_id,
         ClientSerpAnalysis.client_id == client_id
-    ).first()
+    ).delete(synchronize_session=False)
 
-    if not record:
+    if not deleted:
         raise HTTPException(status_code=404, detail="SERP analysis record not found")
 
-    db.delete(record)
     db.commit()
 
     return {"message": "SERP analysis record deleted successfully"}
\ No newline at end of file
@@ -1,65 +1,222 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, lambda_stmt, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import datetime, timezone
 from pathlib import Path
+from functools import lru_cache
+import asyncio
+import re
 import uuid
-import shutil
-import os
-import json
+import orjson
 
-from database import get_db
-from models import Client, ClientSocialAccount, User
-from schemas import SocialAccountCreate, SocialAccountUpdate, SocialAccountResponse
+from database import get_async_db, get_db
+from models import ClientSocialAccount, User
+from schemas import SocialAccountCreate, SocialAccountUpdate, SocialAccountResponse, SocialAccountListItem
 from users import get_current_user
+from deps import authorize_client, authorize_client_async, get_authorized_record, require_client_access
+from uploads import safe_unlink, store_upload, validate_image
+from urls import client_image_url
 
 router = APIRouter()
 
+# Only the columns the list response serializes
+SOCIAL_ACCOUNT_COLUMNS = [getattr(ClientSocialAccount, field) for field in SocialAccountResponse.model_fields]
+SOCIAL_SUMMARY_COLUMNS = [getattr(ClientSocialAccount, field) for field in SocialAccountListItem.model_fields]
+
+# Separator for the comma-separated what_is_exposed field, swallowing surrounding whitespace
+EXPOSED_SEPARATOR = re.compile(r"\s*,\s*")
+
+# Upper bound for the limit query parameter of the list route
+MAX_PAGE_SIZE = 500
+
 # Upload directory setup
 UPLOAD_DIR = Path("uploads/client_images")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-BASE_URL = "https://obsecureiqbackendv1-production-e750.up.railway.app"
+UPLOAD_STR = str(UPLOAD_DIR)
 
 @router.get("/clients/{client_id}/social-accounts", response_model=List[SocialAccountResponse], tags=["Client Social Media"])
-def get_client_social_accounts(
+async def get_client_social_accounts(
     client_id: uuid.UUID,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all social media accounts for a client"""
+    """Get social media accounts for a client, newest first; pass limit/offset to page through them"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
+    await authorize_client_async(db, client_id, current_user)
     
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    result = await db.execute(
+        select(*SOCIAL_ACCOUNT_COLUMNS).where(
+            ClientSocialAccount.client_id == client_id
+        ).order_by(ClientSocialAccount.created_at.desc(), ClientSocialAccount.id).limit(limit).offset(offset)
+    )
+    rows = result.all()
+    
+    # Rows come straight from the DB, so skip re-validation
+    return [SocialAccountResponse.model_construct(**row._mapping) for row in rows]
+
+@router.get("/clients/{client_id}/social-accounts/summary", response_model=List[SocialAccountListItem], tags=["Client Social Media"])
+async def get_client_social_account_summaries(
+    client_id: uuid.UUID,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get id, platform and URL of a client's social media accounts, without notes, exposure lists or images"""
+    
+    await authorize_client_async(db, client_id, current_user)
+    
+    result = await db.execute(
+        select(*SOCIAL_SUMMARY_COLUMNS).where(
+            ClientSocialAccount.client_id == client_id
+        ).order_by(ClientSocialAccount.created_at.desc(), ClientSocialAccount.id).limit(limit).offset(offset)
+    )
+    
+    return [SocialAccountListItem.model_construct(**row._mapping) for row in result.all()]
+
+async def _persist(image: UploadFile) -> str:
+    """Save one uploaded image in the threadpool and return its public URL"""
+    filename = await run_in_threadpool(store_upload, image, UPLOAD_STR)
+    
+    return client_image_url(filename)
+
+async def _save_images(images: List[UploadFile]) -> List[str]:
+    """Validate all images, then save them concurrently; gather keeps the URLs in upload order"""
+    # Reject the whole request before any disk write if one file is invalid
+    for image in images:
+        validate_image(image)
+    
+    return list(await asyncio.gather(*[_persist(image) for image in images]))
+
+@lru_cache(maxsize=1024)
+def _split_exposed(value: str) -> tuple:
+    """Cached split; pasted tag strings repeat often, and the tuple keeps cached results immutable"""
+    return tuple(item for item in EXPOSED_SEPARATOR.split(value.strip()) if item)
+
+def _parse_exposed(value: Optional[str]) -> List[str]:
+    """Split a comma-separated what_is_exposed string into trimmed, non-empty items"""
+    return list(_split_exposed(value)) if value else []
+
+def _purge_images(image_urls: List[str]) -> None:
+    """Remove stored social account images from disk; run as a background task"""
+    for image_url in image_urls:
+        safe_unlink(UPLOAD_DIR / Path(image_url).name)
+
+def _insert_social_account(db: Session, values: dict) -> Optional[ClientSocialAccount]:
+    """Insert unless (client_id, profile_url) already exists; returns None on conflict"""
+    new_social_account = db.scalars(
+        pg_insert(ClientSocialAccount).values(**values).on_conflict_do_nothing(
+            index_elements=["client_id", "profile_url"]
+        ).returning(ClientSocialAccount)
+    ).first()
+    
+    if new_social_account is None:
+        db.rollback()
+        return None
+    
+    db.commit()
+    db.refresh(new_social_account)
+    return new_social_account
+
+def _check_duplicate_url(db: Session, client_id: uuid.UUID, social_account_id: uuid.UUID, profile_url: str) -> None:
+    """Raise 400 if another account of the client already uses profile_url"""
+    # Only the id is needed; lambda_stmt reuses the built statement, binding the closure values per call
+    existing = db.execute(lambda_stmt(lambda: select(ClientSocialAccount.id).where(
+        ClientSocialAccount.client_id == client_id,
+        ClientSocialAccount.profile_url == profile_url,
+        ClientSocialAccount.id != social_account_id
+    ).limit(1))).first()
     
-    social_accounts = db.query(ClientSocialAccount).filter(
-        ClientSocialAccount.client_id == client_id
-    ).order_by(ClientSocialAccount.created_at.desc()).all()
+    if existing:
+        raise HTTPException(
+            status_code=400, 
+            detail="This profile URL already exists"
+        )
+
+def _apply_inline_update(db: Session, update_data: dict, client_id: uuid.UUID, social_account_id: uuid.UUID) -> SocialAccountResponse:
+    """Update the single field sent by inline editing in one UPDATE ... RETURNING and commit"""
+    values = {"updated_at": func.now()}
+    for field, value in update_data.items():
+        if field in ('platform', 'profile_url'):
+            values[field] = value.strip() if value else None
+        elif field == 'what_is_exposed':
+            values[field] = _parse_exposed(value)
+        elif field in ('privacy', 'analyst_notes', 'engagement_level', 'confidence_level'):
+            values[field] = value
+    
+    try:
+        row = db.execute(
+            update(ClientSocialAccount).where(
+                ClientSocialAccount.id == social_account_id,
+                ClientSocialAccount.client_id == client_id
+            ).values(**values).returning(*SOCIAL_ACCOUNT_COLUMNS)
+        ).first()
+    except IntegrityError as e:
+        db.rollback()
+        # The unique (client_id, profile_url) index rejects a URL another account already uses
+        if "ux_social_client_url" in str(e.orig):
+            raise HTTPException(status_code=400, detail="This profile URL already exists")
+        raise
+    
+    if row is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Social media account not found")
     
-    return social_accounts
+    db.commit()
+    return SocialAccountResponse.model_construct(**row._mapping)
+
+def _apply_modal_update(db: Session, social_record: ClientSocialAccount, update_data: dict, images: List[str], client_id: uuid.UUID, social_account_id: uuid.UUID) -> ClientSocialAccount:
+    """Update the fields and image list sent by the edit modal and commit"""
+    # Update record with combined images (remaining + new)
+    social_record.images = images
+    
+    # Update other fields
+    if 'platform' in update_data:
+        social_record.platform = update_data['platform'].strip() if update_data['platform'] else None
+    if 'profile_url' in update_data:
+        # Check duplicate URL if being changed
+        if update_data['profile_url'] and update_data['profile_url'] != social_record.profile_url:
+            _check_duplicate_url(db, client_id, social_account_id, update_data['profile_url'])
+        social_record.profile_url = update_data['profile_url'].strip() if update_data['profile_url'] else None
+    if 'privacy' in update_data:
+        social_record.privacy = update_data['privacy']
+    if 'what_is_exposed' in update_data:
+        social_record.what_is_exposed = _parse_exposed(update_data['what_is_exposed'])
+    if 'engagement_level' in update_data:
+        social_record.engagement_level = update_data['engagement_level']
+    if 'confidence_level' in update_data:
+        social_record.confidence_level = update_data['confidence_level']
+    if 'analyst_notes' in update_data:
+        social_record.analyst_notes = update_data['analyst_notes']
+    
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        # A concurrent edit can take the URL between the duplicate check and the commit
+        if "ux_social_client_url" in str(e.orig):
+            raise HTTPException(status_code=400, detail="This profile URL already exists")
+        raise
+    db.refresh(social_record)
+    return social_record
 
 @router.post("/clients/{client_id}/social-accounts", response_model=SocialAccountResponse, tags=["Client Social Media"])
-def add_client_social_account(
-    client_id: uuid.UUID,
+async def add_client_social_account(
     data: str = Form(...),
     images: List[UploadFile] = File(None),
-    current_user: User = Depends(get_current_user),
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
     """Add a new social media account with multiple images"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
     # Parse JSON data
-    record_data = json.loads(data)
+    record_data = orjson.loads(data)
     
     # Validate required fields
     if not record_data.get('platform') or not record_data.get('platform').strip():
@@ -68,60 +225,41 @@ def add_client_social_account(
     if not record_data.get('profile_url') or not record_data.get('profile_url').strip():
         raise HTTPException(status_code=400, detail="Profile URL is required")
     
-    # Check for duplicate URL
-    existing = db.query(ClientSocialAccount).filter(
-        ClientSocialAccount.client_id == client_id,
-        ClientSocialAccount.profile_url == record_data.get('profile_url')
-    ).first()
+    # Handle multiple image uploads
+    image_urls = await _save_images(images) if images else []
     
-    if existing:
+    # Parse what_is_exposed if provided
+    exposed_list = _parse_exposed(record_data.get('what_is_exposed'))
+    
+    # Create new social account - the unique (client_id, profile_url) index rejects duplicates
+    new_social_account = await run_in_threadpool(_insert_social_account, db, {
+        "client_id": client_id,
+        "platform": record_data.get('platform').strip(),
+        "profile_url": record_data.get('profile_url').strip(),
+        "privacy": record_data.get('privacy'),
+        "what_is_exposed": exposed_list,
+        "engagement_level": record_data.get('engagement_level'),
+        "confidence_level": record_data.get('confidence_level'),
+        "analyst_notes": record_data.get('analyst_notes'),
+        "images": image_urls  # Store multiple images
+    })
+    
+    if new_social_account is None:
+        await asyncio.gather(*[
+            run_in_threadpool(safe_unlink, UPLOAD_DIR / Path(image_url).name) for image_url in image_urls
+        ])
         raise HTTPException(
             status_code=400, 
             detail="This profile URL already exists for this client"
         )
     
-    # Handle multiple image uploads
-    image_urls = []
-    if images:
-        for image in images:
-            ext = Path(image.filename).suffix or ".jpg"
-            filename = f"{uuid.uuid4()}{ext}"
-            filepath = UPLOAD_DIR / filename
-            
-            with filepath.open("wb") as f:
-                shutil.copyfileobj(image.file, f)
-            
-            image_url = f"{BASE_URL}/uploads/client_images/{filename}"
-            image_urls.append(image_url)
-    
-    # Parse what_is_exposed if provided
-    exposed_list = []
-    if record_data.get('what_is_exposed'):
-        exposed_list = [item.strip() for item in record_data.get('what_is_exposed').split(',') if item.strip()]
-    
-    # Create new social account
-    new_social_account = ClientSocialAccount(
-        client_id=client_id,
-        platform=record_data.get('platform').strip(),
-        profile_url=record_data.get('profile_url').strip(),
-        privacy=record_data.get('privacy'),
-        what_is_exposed=exposed_list,
-        engagement_level=record_data.get('engagement_level'),
-        confidence_level=record_data.get('confidence_level'),
-        analyst_notes=record_data.get('analyst_notes'),
-        images=image_urls  # Store multiple images
-    )
-    
-    db.add(new_social_account)
-    db.commit()
-    db.refresh(new_social_account)
-    
     return new_social_account
 
 @router.put("/clients/{client_id}/social-accounts/{social_account_id}", response_model=SocialAccountResponse, tags=["Client Social Media"])
-def edit_client_social_account(
+async def edit_client_social_account(
     client_id: uuid.UUID,
     social_account_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     data: str = Form(...),
     images: List[UploadFile] = File(None),
     current_user: User = Depends(get_current_user),
@@ -129,61 +267,22 @@ def edit_client_social_account(
 ):
     """Edit a social media account with multiple images"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    social_record = db.query(ClientSocialAccount).filter(
-        ClientSocialAccount.id == social_account_id,
-        ClientSocialAccount.client_id == client_id
-    ).first()
-    
-    if not social_record:
-        raise HTTPException(status_code=404, detail="Social media account not found")
-    
-    update_data = json.loads(data)
+    update_data = orjson.loads(data)
     
     # Check if this is an inline update (single field) or modal update (multiple fields + images)
     is_inline_update = len(update_data) == 1 and 'remaining_images' not in update_data and not images
     
     if is_inline_update:
-        # Handle inline update - just update the single field
-        for field, value in update_data.items():
-            if field == 'platform':
-                social_record.platform = value.strip() if value else None
-            elif field == 'profile_url':
-                # Check duplicate URL if being changed
-                if value and value != social_record.profile_url:
-                    existing = db.query(ClientSocialAccount).filter(
-                        ClientSocialAccount.client_id == client_id,
-                        ClientSocialAccount.profile_url == value,
-                        ClientSocialAccount.id != social_account_id
-                    ).first()
-                    
-                    if existing:
-                        raise HTTPException(
-                            status_code=400, 
-                            detail="This profile URL already exists"
-                        )
-                social_record.profile_url = value.strip() if value else None
-            elif field == 'privacy':
-                social_record.privacy = value
-            elif field == 'what_is_exposed':
-                social_record.what_is_exposed = [item.strip() for item in value.split(',') if item.strip()] if value else []
-            elif field == 'analyst_notes':
-                social_record.analyst_notes = value
-            elif field == 'engagement_level':
-                social_record.engagement_level = value
-            elif field == 'confidence_level':
-                social_record.confidence_level = value
-        
-        social_record.updated_at = datetime.now(timezone.utc)
-        db.commit()
-        db.refresh(social_record)
-        return social_record
+        # Handle inline update - just update the single field, no need to load the record first
+        await run_in_threadpool(authorize_client, db, client_id, current_user)
+        return await run_in_threadpool(
+            _apply_inline_update, db, update_data, client_id, social_account_id
+        )
+    
+    social_record = await run_in_threadpool(
+        get_authorized_record,
+        db, ClientSocialAccount, social_account_id, client_id, current_user, "Social media account not found"
+    )
     
     # Handle modal update with images
     # Store original images in memory
@@ -193,107 +292,43 @@ def edit_client_social_account(
     remaining_images = update_data.get('remaining_images', original_images)
     
     # Find images that user removed (to delete from storage)
-    removed_images = [img for img in original_images if img not in remaining_images]
-    
-    # Delete removed images from storage
-    for removed_url in removed_images:
-        try:
-            filename = Path(removed_url).name
-            file_path = UPLOAD_DIR / filename
-            if file_path.exists():
-                file_path.unlink()
-                print(f"Deleted image: {filename}")
-        except Exception as e:
-            print(f"Warning: Could not delete file {filename}: {str(e)}")
+    remaining_set = set(remaining_images)
+    removed_images = [img for img in original_images if img not in remaining_set]
     
     # Upload new images
-    new_image_urls = []
-    if images:
-        for image in images:
-            ext = Path(image.filename).suffix or ".jpg"
-            filename = f"{uuid.uuid4()}{ext}"
-            filepath = UPLOAD_DIR / filename
-            
-            with filepath.open("wb") as f:
-                shutil.copyfileobj(image.file, f)
-            
-            image_url = f"{BASE_URL}/uploads/client_images/{filename}"
-            new_image_urls.append(image_url)
+    new_image_urls = await _save_images(images) if images else []
     
-    # Update record with combined images (remaining + new)
-    social_record.images = remaining_images + new_image_urls
-    
-    # Update other fields
-    if 'platform' in update_data:
-        social_record.platform = update_data['platform'].strip() if update_data['platform'] else None
-    if 'profile_url' in update_data:
-        # Check duplicate URL if being changed
-        if update_data['profile_url'] and update_data['profile_url'] != social_record.profile_url:
-            existing = db.query(ClientSocialAccount).filter(
-                ClientSocialAccount.client_id == client_id,
-                ClientSocialAccount.profile_url == update_data['profile_url'],
-                ClientSocialAccount.id != social_account_id
-            ).first()
-            
-            if existing:
-                raise HTTPException(
-                    status_code=400, 
-                    detail="This profile URL already exists"
-                )
-        social_record.profile_url = update_data['profile_url'].strip() if update_data['profile_url'] else None
-    if 'privacy' in update_data:
-        social_record.privacy = update_data['privacy']
-    if 'what_is_exposed' in update_data:
-        social_record.what_is_exposed = [item.strip() for item in update_data['what_is_exposed'].split(',') if item.strip()] if update_data['what_is_exposed'] else []
-    if 'engagement_level' in update_data:
-        social_record.engagement_level = update_data['engagement_level']
-    if 'confidence_level' in update_data:
-        social_record.confidence_level = update_data['confidence_level']
-    if 'analyst_notes' in update_data:
-        social_record.analyst_notes = update_data['analyst_notes']
-    
-    social_record.updated_at = datetime.now(timezone.utc)
+    updated_record = await run_in_threadpool(
+        _apply_modal_update, db, social_record, update_data, remaining_images + new_image_urls, client_id, social_account_id
+    )
     
-    db.commit()
-    db.refresh(social_record)
+    # Delete removed images from storage once the update is committed, after the response is sent
+    background_tasks.add_task(_purge_images, removed_images)
     
-    return social_record
+    return updated_record
 
 @router.delete("/clients/{client_id}/social-accounts/{social_account_id}", tags=["Client Social Media"])
 def delete_client_social_account(
-    client_id: uuid.UUID,
     social_account_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    background_tasks: BackgroundTasks,
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
     """Delete a social media account"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    social_record = db.query(ClientSocialAccount).filter(
-        ClientSocialAccount.id == social_account_id,
-        ClientSocialAccount.client_id == client_id
+    row = db.execute(
+        delete(ClientSocialAccount).where(
+            ClientSocialAccount.id == social_account_id,
+            ClientSocialAccount.client_id == client_id
+        ).returning(ClientSocialAccount.images)
     ).first()
     
-    if not social_record:
+    if not row:
         raise HTTPException(status_code=404, detail="Social media account not found")
     
-    # Delete associated images if exist
-    if social_record.images:
-        for image_url in social_record.images:
-            try:
-                old_path = UPLOAD_DIR / Path(image_url).name
-                if old_path.exists():
-                    old_path.unlink()
-            except Exception as e:
-                print(f"Warning: Could not delete image: {str(e)}")
-    
-    db.delete(social_record)
     db.commit()
     
+    # Delete associated images after the response is sent
+    background_tasks.add_task(_purge_images, row.images or [])
+    
     return {"message": "Social media account deleted successfully"}
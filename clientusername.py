@@ -1,229 +1,245 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Integer, bindparam, delete, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
 import uuid
+import orjson
 
-from database import get_db
-from models import Client, ClientUsername, User
+from database import get_async_db
+from models import ClientUsername
 from schemas import UsernameCreate, UsernameUpdate, UsernameResponse, BulkUsernameUpload
-from users import get_current_user
-import requests
+from deps import require_client_access_async
+from webhooks import post_json_webhook
 
 router = APIRouter()
 
+# Only the columns the list response serializes
+USERNAME_COLUMNS = [getattr(ClientUsername, field) for field in UsernameResponse.model_fields]
+
+USERNAMES_WEBHOOK_URL = "https://obscureiq.app.n8n.cloud/webhook/aa83c014-36f6-4206-acb2-10507cbe5eb0"
+
+# Upper bound for the limit query parameter of the list route
+MAX_PAGE_SIZE = 500
+
+# Rows fetched per round-trip while streaming the list response
+STREAM_BATCH_SIZE = 1000
+
+# The frontend polls the list; let the browser reuse it briefly, then revalidate with the ETag
+USERNAMES_CACHE_CONTROL = "private, max-age=5"
+
+# Rows per INSERT statement in bulk uploads, bounding statement size and memory
+BULK_INSERT_CHUNK_SIZE = 1000
+
+# Fixed-shape statements are built once here with bind parameters, so requests
+# only bind values and hit SQLAlchemy's compiled cache without rebuilding them
+
+# Row count and latest change of a client's usernames, for the list ETag
+_USERNAMES_ETAG_STMT = select(
+    func.count(),
+    func.max(func.greatest(ClientUsername.created_at, ClientUsername.updated_at))
+).where(ClientUsername.client_id == bindparam("cid"))
+
+def _list_stmt(*cursor):
+    """Newest-first list page; LIMIT NULL means LIMIT ALL in Postgres, so it also serves unpaged lists"""
+    return select(*USERNAME_COLUMNS).where(
+        ClientUsername.client_id == bindparam("cid"), *cursor
+    ).order_by(
+        ClientUsername.created_at.desc(), ClientUsername.id.desc()
+    ).limit(bindparam("limit", type_=Integer)).offset(bindparam("offset", type_=Integer))
+
+# Keyset paging: rows strictly after the cursor in (created_at DESC, id DESC) order.
+# Bulk inserts share one created_at, so the id is needed to page through ties
+_LIST_STMT = _list_stmt()
+_BEFORE = bindparam("before", type_=ClientUsername.created_at.type)
+_LIST_BEFORE_STMT = _list_stmt(ClientUsername.created_at < _BEFORE)
+_LIST_BEFORE_ID_STMT = _list_stmt(
+    tuple_(ClientUsername.created_at, ClientUsername.id)
+    < tuple_(_BEFORE, bindparam("before_id", type_=ClientUsername.id.type))
+)
+
+# Nothing is loaded in the session, so skip synchronizing it
+_DELETE_USERNAME_STMT = delete(ClientUsername).where(
+    ClientUsername.id == bindparam("username_id"),
+    ClientUsername.client_id == bindparam("cid")
+).execution_options(synchronize_session=False)
+
+async def _insert_usernames(db: AsyncSession, client_id: uuid.UUID, usernames: List[str]) -> int:
+    """Insert usernames in chunked multi-row statements, skipping existing ones via the unique index. Returns the number added"""
+    unique_usernames = list(dict.fromkeys(usernames))
+    added_count = 0
+    
+    for start in range(0, len(unique_usernames), BULK_INSERT_CHUNK_SIZE):
+        result = await db.execute(
+            pg_insert(ClientUsername).values([
+                {"client_id": client_id, "username": username}
+                for username in unique_usernames[start:start + BULK_INSERT_CHUNK_SIZE]
+            ]).on_conflict_do_nothing(index_elements=["client_id", "username"])
+        )
+        added_count += result.rowcount
+    
+    # One commit for the whole upload
+    await db.commit()
+    return added_count
+
+async def _usernames_etag(db: AsyncSession, client_id: uuid.UUID) -> str:
+    """Weak ETag from the row count and latest change, which every add, edit and delete moves"""
+    count, last_change = (await db.execute(_USERNAMES_ETAG_STMT, {"cid": client_id})).one()
+    stamp = int(last_change.timestamp() * 1_000_000) if last_change else 0
+    return f'W/"{count}-{stamp}"'
+
+async def _notify_usernames_webhook(client_id: uuid.UUID, payload: bytes) -> None:
+    """Post a bulk upload to n8n after the response is sent, logging failures"""
+    try:
+        await post_json_webhook(USERNAMES_WEBHOOK_URL, payload)
+    except Exception as e:
+        print(f"Warning: Usernames webhook failed for client {client_id}: {str(e)}")
+
 @router.get("/clients/{client_id}/usernames", response_model=List[UsernameResponse], tags=["Client Usernames"])
-def get_client_usernames(
-    client_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_client_usernames(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    before: Optional[datetime] = None,
+    before_id: Optional[uuid.UUID] = None,
+    client_id: uuid.UUID = Depends(require_client_access_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all usernames for a client"""
-    
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    usernames = db.query(ClientUsername).filter(
-        ClientUsername.client_id == client_id
-    ).order_by(ClientUsername.created_at.desc()).all()
-    
-    return usernames
+    """Get usernames for a client, newest first; page with limit plus offset, or with the last row's created_at/id as before/before_id"""
+    
+    # Unchanged since the client's copy: skip the list query and the body entirely
+    etag = await _usernames_etag(db, client_id)
+    headers = {"ETag": etag, "Cache-Control": USERNAMES_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))):
+        return Response(status_code=304, headers=headers)
+    
+    params = {"cid": client_id, "limit": limit, "offset": offset}
+    if before is not None and before_id is not None:
+        query = _LIST_BEFORE_ID_STMT
+        params.update(before=before, before_id=before_id)
+    elif before is not None:
+        query = _LIST_BEFORE_STMT
+        params["before"] = before
+    else:
+        query = _LIST_STMT
+    
+    result = await db.stream(query, params, execution_options={"yield_per": STREAM_BATCH_SIZE})
+    
+    async def encode_rows():
+        """Encode the JSON array one batch at a time, so only STREAM_BATCH_SIZE rows are held in memory"""
+        prefix = b"["
+        async for batch in result.partitions():
+            yield prefix + b",".join(orjson.dumps(dict(row._mapping)) for row in batch)
+            prefix = b","
+        yield b"[]" if prefix == b"[" else b"]"
+    
+    # The session stays open until the response finishes, since yield dependencies exit after it is sent
+    return StreamingResponse(encode_rows(), media_type="application/json", headers=headers)
 
 @router.post("/clients/{client_id}/usernames", response_model=UsernameResponse, tags=["Client Usernames"])
-def add_client_username(
-    client_id: uuid.UUID,
+async def add_client_username(
     username_data: UsernameCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    client_id: uuid.UUID = Depends(require_client_access_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add a new username"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Check duplicate
-    existing = db.query(ClientUsername).filter(
-        ClientUsername.client_id == client_id,
-        ClientUsername.username == username_data.username
-    ).first()
-    
-    if existing:
+    # Create new username - the unique (client_id, username) index rejects duplicates
+    new_username = (await db.scalars(
+        pg_insert(ClientUsername).values(
+            client_id=client_id,
+            username=username_data.username
+        ).on_conflict_do_nothing(
+            index_elements=["client_id", "username"]
+        ).returning(ClientUsername)
+    )).first()
+    
+    if new_username is None:
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Username already exists for this client")
     
-    # Create new username
-    new_username = ClientUsername(
-        client_id=client_id,
-        username=username_data.username
-    )
-    
-    db.add(new_username)
-    db.commit()
-    db.refresh(new_username)
+    # RETURNING already loaded every column, and expire_on_commit=False keeps them
+    await db.commit()
     
     return new_username
 
 @router.put("/clients/{client_id}/usernames/{username_id}", response_model=UsernameResponse, tags=["Client Usernames"])
-def edit_client_username(
-    client_id: uuid.UUID,
+async def edit_client_username(
     username_id: uuid.UUID,
     username_data: UsernameUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    client_id: uuid.UUID = Depends(require_client_access_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Edit a username - works for both modal and inline editing"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    username_record = db.query(ClientUsername).filter(
-        ClientUsername.id == username_id,
-        ClientUsername.client_id == client_id
-    ).first()
-    
-    if not username_record:
-        raise HTTPException(status_code=404, detail="Username not found")
-    
-    # Check duplicate if username is being changed
-    if username_data.username and username_data.username != username_record.username:
-        existing = db.query(ClientUsername).filter(
-            ClientUsername.client_id == client_id,
-            ClientUsername.username == username_data.username,
-            ClientUsername.id != username_id
-        ).first()
-        
-        if existing:
-            raise HTTPException(status_code=400, detail="Username already exists for this client")
-    
-    # Update only the fields that are provided
+    # Update only the fields that are provided, in one UPDATE ... RETURNING
     update_data = username_data.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(username_record, field, value)
+    try:
+        row = (await db.execute(
+            update(ClientUsername).where(
+                ClientUsername.id == username_id,
+                ClientUsername.client_id == client_id
+            ).values(**update_data, updated_at=func.now()).returning(*USERNAME_COLUMNS)
+        )).first()
+    except IntegrityError as e:
+        await db.rollback()
+        # The unique (client_id, username) index rejects renaming onto an existing username
+        if "ux_username_client_username" in str(e.orig):
+            raise HTTPException(status_code=400, detail="Username already exists for this client")
+        raise
     
-    username_record.updated_at = datetime.now(timezone.utc)
+    if row is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Username not found")
     
-    db.commit()
-    db.refresh(username_record)
+    await db.commit()
     
-    return username_record
+    return UsernameResponse.model_construct(**row._mapping)
 
 @router.delete("/clients/{client_id}/usernames/{username_id}", tags=["Client Usernames"])
-def delete_client_username(
-    client_id: uuid.UUID,
+async def delete_client_username(
     username_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    client_id: uuid.UUID = Depends(require_client_access_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a username"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    result = await db.execute(_DELETE_USERNAME_STMT, {"username_id": username_id, "cid": client_id})
     
-    username_record = db.query(ClientUsername).filter(
-        ClientUsername.id == username_id,
-        ClientUsername.client_id == client_id
-    ).first()
-    
-    if not username_record:
+    if not result.rowcount:
         raise HTTPException(status_code=404, detail="Username not found")
     
-    db.delete(username_record)
-    db.commit()
+    await db.commit()
     
     return {"message": "Username deleted successfully"}
 
 @router.post("/clients/{client_id}/usernames/bulk-upload", tags=["Client Usernames"])
-def bulk_upload_usernames(
-    client_id: uuid.UUID,
+async def bulk_upload_usernames(
     bulk_data: BulkUsernameUpload,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    client_id: uuid.UUID = Depends(require_client_access_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Send raw usernames directly to n8n webhook and return result"""
-    
-    # Check client access
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
+    """Insert raw usernames directly, then notify the n8n webhook"""
     
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    usernames = [line.strip() for line in bulk_data.usernames_text.splitlines() if line.strip()]
+    if not usernames:
+        raise HTTPException(status_code=400, detail="No usernames provided")
     
-    # NOTE: If webhook is not active, will fallback to direct database insert
-    webhook_url = "https://obscureiq.app.n8n.cloud/webhook/aa83c014-36f6-4206-acb2-10507cbe5eb0"
+    added_count = await _insert_usernames(db, client_id, usernames)
     
-    payload = {
+    # The rows are already stored, so n8n is notified after the response instead of adding its round-trip
+    payload = orjson.dumps({
         "usernames": bulk_data.usernames_text,
         "client_id": str(client_id)
-    }
+    })
+    background_tasks.add_task(_notify_usernames_webhook, client_id, payload)
     
-    try:
-        response = requests.post(webhook_url, json=payload, timeout=60)
-        
-        # Check if response is JSON
-        try:
-            n8n_result = response.json()
-        except:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Webhook returned non-JSON response: {response.text[:200]}"
-            )
-        
-        # Check for n8n webhook registration error - if webhook not active, insert directly
-        if "detail" in n8n_result and "not registered" in str(n8n_result.get("detail", "")):
-            # Fallback: Insert directly without webhook
-            usernames_list = bulk_data.usernames_text.strip().split('\n')
-            added_count = 0
-            
-            for username_line in usernames_list:
-                username = username_line.strip()
-                if username:
-                    # Check duplicate
-                    existing = db.query(ClientUsername).filter(
-                        ClientUsername.client_id == client_id,
-                        ClientUsername.username == username
-                    ).first()
-                    
-                    if not existing:
-                        new_username = ClientUsername(
-                            client_id=client_id,
-                            username=username
-                        )
-                        db.add(new_username)
-                        added_count += 1
-            
-            db.commit()
-            return {
-                "status": "success",
-                "message": f"{added_count} username(s) added successfully (webhook inactive, used direct insert)"
-            }
-        
-        if n8n_result.get("success") is True or n8n_result.get("status") == "Success":
-            return {
-                "status": "success",
-                "message": n8n_result.get("message", "Usernames added successfully")
-            }
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=n8n_result.get("message") or n8n_result.get("detail") or "Failed to insert usernames"
-            )
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Webhook error: {str(e)}")
+    return {
+        "status": "success",
+        "message": f"{added_count} username(s) added successfully"
+    }
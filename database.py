@@ -1,26 +1,34 @@
+import logging
 import os
-from sqlalchemy import create_engine
+import uuid
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from urllib.parse import quote_plus
 from models import Base
 
-# Load environment variables (only if .env file exists)
+# Load environment variables from .env when present; this is the only module that loads .env
 from dotenv import load_dotenv
-if os.path.exists('.env'):
-    load_dotenv()
-    print("📁 Loaded .env file")
-else:
-    print("🌐 Using Railway environment variables")
+load_dotenv()
 
-# Database configuration with fallback values
+logger = logging.getLogger(__name__)
+
+# Database configuration; non-secret settings fall back to the Supabase pooler, credentials must be set
 DB_HOST = os.getenv("DB_HOST") or "aws-1-us-west-1.pooler.supabase.com"
 DB_PORT = os.getenv("DB_PORT") or "6543"
 DB_NAME = os.getenv("DB_NAME") or "postgres"
-DB_USER = os.getenv("DB_USER") or "postgres.tgqpsbfwkzdgmynrdvnc"
-DB_PASSWORD = os.getenv("DB_PASSWORD") or "admin123"
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_SSLMODE = os.getenv("DB_SSLMODE") or "require"
+if not DB_USER or not DB_PASSWORD:
+    raise RuntimeError("DB_USER and DB_PASSWORD must be set in the environment or .env")
+
+# Connections per worker process for each engine; the overflow allows the same again under bursts
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE") or max(5, (os.cpu_count() or 1) * 2))
+
+# Fail fast with an error instead of queueing requests when the pool is exhausted
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT") or 5)
 
-print(f"🔗 Connecting to database: {DB_HOST}:{DB_PORT}/{DB_NAME}")
 # URL encode password to handle special characters
 encoded_password = quote_plus(DB_PASSWORD)
 
@@ -31,22 +39,71 @@ DATABASE_URL = f"postgresql://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,
-    pool_recycle=300,
-    pool_size=10,
-    max_overflow=20
+    pool_recycle=1800,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_POOL_SIZE,
+    pool_timeout=DB_POOL_TIMEOUT
 )
 
 # Create session factory
 SessionLocal = sessionmaker(bind=engine)
 
-print(f"✅ Database connection established successfully")
+# Async engine for routes that await the database on the event loop.
+# The Supabase pooler on 6543 is PgBouncer in transaction mode, where a prepared
+# statement may land on a different server connection, so asyncpg's caches are
+# disabled there and each statement gets a unique name. On a session-pinned
+# connection (direct, or the session pooler on 5432) repeated queries reuse
+# their server-side prepared statements and skip parse and plan.
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE") or (0 if DB_PORT == "6543" else 250))
 
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_POOL_SIZE,
+    pool_timeout=DB_POOL_TIMEOUT,
+    connect_args={
+        "ssl": DB_SSLMODE,
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+)
 
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+logger.debug("Database configured for %s:%s/%s", DB_HOST, DB_PORT, DB_NAME)
+
+
+# Unique indexes that INSERT ... ON CONFLICT statements target. Startup only builds them; if existing
+# duplicate rows block one, startup stops and an operator must run dedupe_unique_indexes.py first
+REQUIRED_UNIQUE_INDEXES = frozenset({"ux_social_client_url", "ux_username_client_username"})
 
 # Create all tables
 def create_tables():
     Base.metadata.create_all(bind=engine)
-    print("Database tables created successfully")
+    # create_all skips indexes on tables that already exist, so add any new ones
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspect(engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                if index.name in REQUIRED_UNIQUE_INDEXES:
+                    logger.error(
+                        "Could not create required index %s on %s: %s. Run "
+                        "'python dedupe_unique_indexes.py' to review duplicate rows and remove them with --apply",
+                        index.name, table.name, e
+                    )
+                    raise RuntimeError(f"Required index {index.name} is missing; run dedupe_unique_indexes.py") from e
+                logger.warning("Could not create index %s: %s", index.name, e)
+    logger.info("Database tables created successfully")
 
 # Dependency to get database session
 def get_db():
@@ -55,3 +112,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Async dependency for routes using AsyncSession
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,45 @@
+"""One-off migration: remove duplicate rows that block the required unique indexes, then build them.
+
+Run by an operator, never at startup:
+    python dedupe_unique_indexes.py           # report duplicates only
+    python dedupe_unique_indexes.py --apply   # delete them (keeping the oldest row per key) and build the indexes
+"""
+import sys
+from sqlalchemy import inspect, text
+
+from database import REQUIRED_UNIQUE_INDEXES, engine
+from models import Base
+
+def _required_indexes():
+    """Required unique indexes that do not exist in the database yet"""
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspect(engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in REQUIRED_UNIQUE_INDEXES and index.name not in existing:
+                yield index
+
+def _newer_duplicate(index) -> str:
+    """Condition on aliases a and b matching a row a that shares index's key with an older row b"""
+    key_match = " AND ".join(f'a."{column.name}" = b."{column.name}"' for column in index.columns)
+    return f"{key_match} AND (a.created_at, a.id) > (b.created_at, b.id)"
+
+def main(apply: bool) -> None:
+    for index in list(_required_indexes()):
+        table = index.table.name
+        with engine.begin() as conn:
+            duplicates = conn.execute(text(
+                f'SELECT count(DISTINCT a.id) FROM "{table}" a JOIN "{table}" b ON {_newer_duplicate(index)}'
+            )).scalar()
+            print(f"{table}: {duplicates} duplicate row(s) block {index.name}")
+            if not apply:
+                continue
+
+            conn.execute(text(f'DELETE FROM "{table}" a USING "{table}" b WHERE {_newer_duplicate(index)}'))
+            index.create(bind=conn)
+            print(f"Deleted {duplicates} row(s) and created {index.name}")
+
+    if not apply:
+        print("Dry run; re-run with --apply to delete the rows listed above and build the indexes")
+
+if __name__ == "__main__":
+    main("--apply" in sys.argv[1:])
@@ -0,0 +1,131 @@
+from fastapi import HTTPException, Depends
+from sqlalchemy import lambda_stmt, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, raiseload
+from collections import OrderedDict
+import threading
+import uuid
+import time
+import os
+
+from database import get_async_db, get_db
+from models import Client, User
+from users import get_current_user
+
+# Roles that may only access clients assigned to them
+RESTRICTED_ROLES = frozenset({"Analyst"})
+
+# With DEBUG=1, lazy relationship loads on fetched records raise instead of issuing hidden queries
+DEBUG = os.getenv("DEBUG") == "1"
+
+# Seconds a granted (client, user) access decision is reused across requests. Denials are never cached.
+# assign.py only invalidates the cache of the worker handling the (un)assignment or deletion, so with several
+# workers an unassigned analyst, or any user of a deleted client, may keep access on the others for up to this long
+CLIENT_ACCESS_TTL = float(os.getenv("CLIENT_ACCESS_TTL", "5"))
+
+# Most grants kept in the access cache; the least recently used are evicted first
+CLIENT_ACCESS_CACHE_SIZE = int(os.getenv("CLIENT_ACCESS_CACHE_SIZE", "10000"))
+
+# (client_id, user_id) -> expires_at in LRU order, for access checks that passed.
+# Sync routes check access from threadpool threads, so updates hold the lock
+_access_grants = OrderedDict()
+_access_grants_lock = threading.Lock()
+
+def _access_granted(client_id: uuid.UUID, user_id) -> bool:
+    """Whether the user passed an access check for the client within CLIENT_ACCESS_TTL"""
+    key = (client_id, user_id)
+    with _access_grants_lock:
+        expires_at = _access_grants.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del _access_grants[key]
+            return False
+        _access_grants.move_to_end(key)
+        return True
+
+def _remember_access(client_id: uuid.UUID, user_id) -> None:
+    key = (client_id, user_id)
+    with _access_grants_lock:
+        _access_grants[key] = time.monotonic() + CLIENT_ACCESS_TTL
+        _access_grants.move_to_end(key)
+        if len(_access_grants) > CLIENT_ACCESS_CACHE_SIZE:
+            _access_grants.popitem(last=False)
+
+def invalidate_client_access(client_id: uuid.UUID) -> None:
+    """Drop this worker's cached grants for a client after it is reassigned or deleted"""
+    with _access_grants_lock:
+        for key in [key for key in _access_grants if key[0] == client_id]:
+            del _access_grants[key]
+
+def _analyst_stmt(client_id: uuid.UUID):
+    """SELECT analyst_id for one client; built once by lambda_stmt, with client_id bound per call"""
+    return lambda_stmt(lambda: select(Client.analyst_id).where(Client.id == client_id))
+
+def _check_analyst(client_id: uuid.UUID, analyst_id, current_user: User) -> None:
+    """Raise 403 unless the user may access a client assigned to analyst_id, caching the grant"""
+    if current_user.role in RESTRICTED_ROLES and analyst_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    _remember_access(client_id, current_user.id)
+
+def authorize_client(db: Session, client_id: uuid.UUID, current_user: User) -> None:
+    """Raise 404/403 unless the current user may access the client, selecting only analyst_id on a cache miss"""
+    if _access_granted(client_id, current_user.id):
+        return
+    
+    row = db.execute(_analyst_stmt(client_id)).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Client not found")
+    
+    _check_analyst(client_id, row.analyst_id, current_user)
+
+def require_client_access(
+    client_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> uuid.UUID:
+    """Dependency returning the path's client_id once the current user is authorized for it"""
+    authorize_client(db, client_id, current_user)
+    return client_id
+
+async def authorize_client_async(db: AsyncSession, client_id: uuid.UUID, current_user: User) -> None:
+    """authorize_client for routes using AsyncSession"""
+    if _access_granted(client_id, current_user.id):
+        return
+    
+    row = (await db.execute(_analyst_stmt(client_id))).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Client not found")
+    
+    _check_analyst(client_id, row.analyst_id, current_user)
+
+async def require_client_access_async(
+    client_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+) -> uuid.UUID:
+    """require_client_access for routes using AsyncSession"""
+    await authorize_client_async(db, client_id, current_user)
+    return client_id
+
+def get_authorized_record(db: Session, model, record_id: uuid.UUID, client_id: uuid.UUID, current_user: User, not_found: str):
+    """Fetch a client's child record and check access in one JOIN query"""
+    query = db.query(model, Client.analyst_id).join(
+        Client, Client.id == model.client_id
+    ).filter(
+        model.id == record_id,
+        model.client_id == client_id
+    )
+    if DEBUG:
+        query = query.options(raiseload("*"))
+    
+    row = query.first()
+    
+    if row is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    
+    record, analyst_id = row
+    # The JOIN already read analyst_id; a passing check is cached, so later checks on this client skip their query
+    _check_analyst(client_id, analyst_id, current_user)
+    
+    return record
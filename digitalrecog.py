@@ -1,32 +1,315 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import insert, select, update
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime, timezone
 from pathlib import Path
 import uuid
-import shutil
-import json
-import os
+import orjson
 
 from database import get_db
 from models import (
-    Client, ClientFrontHouseRecord, ClientBackHouseRecord, 
+    ClientFrontHouseRecord, ClientBackHouseRecord, 
     ClientInsideHouseRecord, ClientGoogleStreetViewRecord, User
 )
 from schemas import (
     FrontHouseRecordCreate, FrontHouseRecordUpdate, FrontHouseRecordResponse,
     BackHouseRecordCreate, BackHouseRecordUpdate, BackHouseRecordResponse,
     InsideHouseRecordCreate, InsideHouseRecordUpdate, InsideHouseRecordResponse,
-    GoogleStreetViewRecordCreate, GoogleStreetViewRecordUpdate, GoogleStreetViewRecordResponse
+    GoogleStreetViewRecordCreate, GoogleStreetViewRecordUpdate, GoogleStreetViewRecordResponse,
+    ImageUploadRequest, PresignedImageUpload,
+    PropertyAssessmentRecordsCreate, PropertyAssessmentRecordsResponse
 )
 from users import get_current_user
+from deps import authorize_client, get_authorized_record, require_client_access
+from uploads import (
+    delete_stored_image, file_extension, owned_image_keys, presign_image_upload, save_uploads_concurrently,
+    save_uploads_parallel, store_upload, sync_stored_files, validate_image
+)
+from urls import client_image_url, stored_image_name
 
 router = APIRouter()
-BASE_URL = "https://obsecureiqbackendv1-production-e750.up.railway.app"
 
 # Upload directory setup
 UPLOAD_DIR = Path("uploads/client_images")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+UPLOAD_STR = str(UPLOAD_DIR)
+
+def _save_upload(image: UploadFile) -> str:
+    """Save an uploaded image, sharing storage with identical earlier uploads, and return its filename; responses build the URL"""
+    return store_upload(image, UPLOAD_STR)
+
+async def _save_uploads(images: List[UploadFile]) -> List[str]:
+    """Validate all images, then save them concurrently, returning their filenames in upload order"""
+    # Reject the whole request before any disk write if one file is invalid
+    for image in images:
+        validate_image(image)
+    
+    return await save_uploads_concurrently(_save_upload, images)
+
+def _sync_images(filenames: List[str]) -> None:
+    """Make newly saved images durable after the response is sent; run as a background task"""
+    sync_stored_files(UPLOAD_DIR, filenames)
+
+def _purge_images(client_id: uuid.UUID, images: List[str]) -> None:
+    """Remove a client's stored record images from disk or the bucket; run as a background task"""
+    for image in images:
+        delete_stored_image(image, UPLOAD_DIR, str(client_id))
+
+# Fields each record type accepts, with the value used when a create request omits one.
+# Inline edits may change any of them; the modal edit may also replace real_estate_websites
+FRONT_HOUSE_FIELDS = {
+    'home_visible_from_street': 'No', 'exterior_lighting': 'No', 'surveillance_cameras': 'No',
+    'motion_sensors_alarms': 'No', 'ground_floor_windows_accessible': 'No',
+    'bars_locks_reinforced_glass': 'No', 'gate_fence': 'No', 'obstruction_of_view': None, 'security_signage': 'No'
+}
+BACK_HOUSE_FIELDS = {
+    'rear_entry_door': 'No', 'ground_floor_windows_accessible': 'No', 'rear_exterior_lighting': 'No',
+    'bars_locks_reinforced_glass': 'No', 'gate_fence': 'No', 'obstruction_of_view': None,
+    'surveillance_cameras': 'No', 'landscaping_concealment': 'None', 'outbuildings_visible': 'No', 'pet_door_present': 'No'
+}
+INSIDE_HOUSE_FIELDS = {'layout_exposure': None}
+STREET_VIEW_FIELDS = dict.fromkeys(FRONT_HOUSE_FIELDS)
+
+def _modal_fields(fields: dict) -> frozenset:
+    """Fields the edit modal may set for a record type"""
+    return frozenset(fields) | {'real_estate_websites'}
+
+FRONT_HOUSE_INLINE, FRONT_HOUSE_MODAL = frozenset(FRONT_HOUSE_FIELDS), _modal_fields(FRONT_HOUSE_FIELDS)
+BACK_HOUSE_INLINE, BACK_HOUSE_MODAL = frozenset(BACK_HOUSE_FIELDS), _modal_fields(BACK_HOUSE_FIELDS)
+INSIDE_HOUSE_INLINE, INSIDE_HOUSE_MODAL = frozenset(INSIDE_HOUSE_FIELDS), _modal_fields(INSIDE_HOUSE_FIELDS)
+# The street view modal has never edited real_estate_websites
+STREET_VIEW_INLINE = STREET_VIEW_MODAL = frozenset(STREET_VIEW_FIELDS)
+
+# Only the columns each list response serializes
+LIST_COLUMNS = {
+    model: [getattr(model, field) for field in response_model.model_fields]
+    for model, response_model in (
+        (ClientFrontHouseRecord, FrontHouseRecordResponse),
+        (ClientBackHouseRecord, BackHouseRecordResponse),
+        (ClientInsideHouseRecord, InsideHouseRecordResponse),
+        (ClientGoogleStreetViewRecord, GoogleStreetViewRecordResponse),
+    )
+}
+
+def _add_record(db: Session, record):
+    """Insert a new record and reload its server-generated columns"""
+    db.add(record)
+    db.commit()
+    db.refresh(record)
+    return record
+
+def _insert_records(db: Session, model, client_id: uuid.UUID, records_data: list) -> list:
+    """Insert records with one INSERT ... RETURNING (batched by insertmanyvalues), without committing"""
+    if not records_data:
+        return []
+    # Omitted fields fall back to the column defaults
+    rows = [{**record.model_dump(exclude_none=True), "client_id": client_id} for record in records_data]
+    
+    # Files are only attached through the upload routes; the body may reference this client's bucket keys only
+    for row in rows:
+        if "images" in row:
+            row["images"] = owned_image_keys(str(client_id), row["images"])
+    
+    return db.scalars(
+        insert(model).returning(model, sort_by_parameter_order=True),
+        rows
+    ).all()
+
+def _append_images(db: Session, record, filenames: List[str]):
+    """Append uploaded image filenames to a record's images and save it"""
+    record.images = (record.images or []) + filenames
+    db.commit()
+    db.refresh(record)
+    return record
+
+# ==================== SHARED RECORD HANDLERS ====================
+# The four record types differ only in model and fields; the routes below delegate here
+
+def _list_records(db: Session, model, client_id: uuid.UUID, current_user: User) -> ORJSONResponse:
+    """All of a client's records of one type, newest first.
+    
+    Rows are serialized straight from the selected columns rather than revalidated through the
+    response model, so only the image filename-to-URL step of the schema is applied here"""
+    authorize_client(db, client_id, current_user)
+    rows = db.execute(
+        select(*LIST_COLUMNS[model]).where(
+            model.client_id == client_id
+        ).order_by(model.created_at.desc())
+    ).mappings().all()
+    
+    return ORJSONResponse([
+        {**row, "images": None if row["images"] is None else [client_image_url(image) for image in row["images"]]}
+        for row in rows
+    ])
+
+async def _create_record(db: Session, model, fields: dict, client_id: uuid.UUID, data: str, images: List[UploadFile], background_tasks: BackgroundTasks):
+    """Create a record from the JSON form field plus any uploaded images"""
+    # Parse JSON data
+    record_data = orjson.loads(data)
+    
+    # Images the browser already PUT to the bucket arrive as keys; the rest are uploaded here
+    image_keys = owned_image_keys(str(client_id), record_data.get('image_keys', []))
+    filenames = await _save_uploads(images or [])
+    
+    record = model(
+        client_id=client_id,
+        real_estate_websites=record_data.get('real_estate_websites', []),
+        images=filenames + image_keys,
+        **{field: record_data.get(field, default) for field, default in fields.items()}
+    )
+    record = await run_in_threadpool(_add_record, db, record)
+    
+    background_tasks.add_task(_sync_images, filenames)
+    return record
+
+async def _upload_record_images(
+    db: Session, model, response_model, client_id: uuid.UUID, record_id: uuid.UUID,
+    images: List[UploadFile], current_user: User, background_tasks: BackgroundTasks
+) -> dict:
+    """Append newly uploaded images to an existing record"""
+    record = await run_in_threadpool(
+        get_authorized_record, db, model, record_id, client_id, current_user, "Record not found"
+    )
+    
+    if not images:
+        raise HTTPException(status_code=400, detail="At least one image is required")
+    
+    filenames = await _save_uploads(images)
+    
+    # Update record with new image filenames
+    record = await run_in_threadpool(_append_images, db, record, filenames)
+    background_tasks.add_task(_sync_images, filenames)
+    
+    return {
+        "success": True,
+        "message": f"Uploaded {len(filenames)} image(s)",
+        "image_urls": [client_image_url(filename) for filename in filenames],
+        "record": response_model.model_validate(record)
+    }
+
+def _update_record(
+    db: Session, model, inline_fields: frozenset, modal_fields: frozenset,
+    client_id: uuid.UUID, record_id: uuid.UUID, data: str, images: List[UploadFile],
+    current_user: User, background_tasks: BackgroundTasks
+):
+    """Apply an inline single-field edit, or a modal edit that also replaces the image set"""
+    update_data = orjson.loads(data)
+    
+    # Check if this is an inline update (single field) or modal update (multiple fields + images)
+    is_inline_update = (
+        len(update_data) == 1 and 'remaining_images' not in update_data
+        and 'image_keys' not in update_data and not images
+    )
+    allowed_fields = inline_fields if is_inline_update else modal_fields
+    values = {field: value for field, value in update_data.items() if field in allowed_fields}
+    
+    if is_inline_update and values:
+        # Inline edits never need the current row: one UPDATE ... RETURNING, with access usually served from cache
+        authorize_client(db, client_id, current_user)
+        record = db.scalars(
+            update(model).where(
+                model.id == record_id,
+                model.client_id == client_id
+            ).values(**values).returning(model)
+        ).first()
+        if record is None:
+            raise HTTPException(status_code=404, detail="Record not found")
+        
+        # RETURNING loaded every column; detach so the commit does not expire them and force a reload
+        db.expunge(record)
+        db.commit()
+        return record
+    
+    record = get_authorized_record(db, model, record_id, client_id, current_user, "Record not found")
+    
+    for field, value in values.items():
+        setattr(record, field, value)
+    
+    if not is_inline_update:
+        for image in images or []:
+            validate_image(image)
+        
+        original_images = record.images or []
+        
+        # Get remaining images from frontend (after user removed some); it sends back URLs, records keep filenames.
+        # Only images already on this record may remain, so a request cannot adopt (and later purge) other files
+        original_names = {stored_image_name(img) for img in original_images}
+        remaining_images = [
+            name for name in map(stored_image_name, update_data.get('remaining_images', original_images))
+            if name in original_names
+        ]
+        image_keys = owned_image_keys(str(client_id), update_data.get('image_keys', []))
+        
+        # Find images that user removed (to delete from storage)
+        remaining_set = set(remaining_images)
+        removed_images = [img for img in original_images if stored_image_name(img) not in remaining_set]
+        
+        # Delete removed images from storage after the response is sent
+        background_tasks.add_task(_purge_images, client_id, removed_images)
+        
+        # Final images = remaining existing images + newly uploaded images + direct bucket uploads
+        new_filenames = save_uploads_parallel(_save_upload, images or [])
+        record.images = remaining_images + new_filenames + image_keys
+        background_tasks.add_task(_sync_images, new_filenames)
+    
+    db.commit()
+    db.refresh(record)
+    return record
+
+def _delete_record(db: Session, model, client_id: uuid.UUID, record_id: uuid.UUID, current_user: User, background_tasks: BackgroundTasks) -> dict:
+    """Delete a record and, after the response is sent, its image files"""
+    record = get_authorized_record(db, model, record_id, client_id, current_user, "Record not found")
+    images = record.images or []
+    
+    db.delete(record)
+    db.commit()
+    
+    background_tasks.add_task(_purge_images, client_id, images)
+    return {"message": "Record deleted successfully"}
+
+# ==================== DIRECT IMAGE UPLOADS ====================
+
+@router.post("/clients/{client_id}/digital-recognition/image-uploads", response_model=List[PresignedImageUpload], tags=["Digital Recognition"])
+def create_image_uploads(
+    uploads: List[ImageUploadRequest],
+    client_id: uuid.UUID = Depends(require_client_access)
+):
+    """Pre-signed PUT URLs for uploading images straight to the bucket; send the keys back as image_keys"""
+    if not uploads:
+        raise HTTPException(status_code=400, detail="At least one image is required")
+    
+    return [
+        presign_image_upload(str(client_id), file_extension(upload.filename), upload.content_type)
+        for upload in uploads
+    ]
+
+# ==================== ALL RECORD TYPES ====================
+
+@router.post("/clients/{client_id}/all-records", response_model=PropertyAssessmentRecordsResponse, tags=["Digital Recognition"])
+def create_all_records(
+    records_data: PropertyAssessmentRecordsCreate,
+    client_id: uuid.UUID = Depends(require_client_access),
+    db: Session = Depends(get_db)
+):
+    """Create front, back, inside house and street view records together in one transaction"""
+    if not (records_data.front_house or records_data.back_house or records_data.inside_house or records_data.google_street_view):
+        raise HTTPException(status_code=400, detail="At least one record is required")
+    
+    # One multi-row INSERT per record type, committed once
+    records = {
+        "front_house": _insert_records(db, ClientFrontHouseRecord, client_id, records_data.front_house),
+        "back_house": _insert_records(db, ClientBackHouseRecord, client_id, records_data.back_house),
+        "inside_house": _insert_records(db, ClientInsideHouseRecord, client_id, records_data.inside_house),
+        "google_street_view": _insert_records(db, ClientGoogleStreetViewRecord, client_id, records_data.google_street_view),
+    }
+    
+    # RETURNING loaded every column; detach so the commit does not expire them and force reloads
+    db.expunge_all()
+    db.commit()
+    
+    return records
 
 # ==================== FRONT OF HOUSE APIS ====================
 
@@ -37,250 +320,75 @@ def get_front_house_records(
     db: Session = Depends(get_db)
 ):
     """Get all front house records for a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    return db.query(ClientFrontHouseRecord).filter(
-        ClientFrontHouseRecord.client_id == client_id
-    ).order_by(ClientFrontHouseRecord.created_at.desc()).all()
+    return _list_records(db, ClientFrontHouseRecord, client_id, current_user)
 
 @router.post("/clients/{client_id}/front-house-records", response_model=FrontHouseRecordResponse, tags=["Digital Recognition - Front House"])
-def create_front_house_record(
-    client_id: uuid.UUID,
+async def create_front_house_record(
+    background_tasks: BackgroundTasks,
     data: str = Form(...),
     images: List[UploadFile] = File(None),
-    current_user: User = Depends(get_current_user),
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
     """Create a new front house record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Parse JSON data
-    record_data = json.loads(data)
+    return await _create_record(db, ClientFrontHouseRecord, FRONT_HOUSE_FIELDS, client_id, data, images, background_tasks)
+
+@router.post("/clients/{client_id}/front-house-records/bulk", response_model=List[FrontHouseRecordResponse], tags=["Digital Recognition - Front House"])
+def bulk_create_front_house_records(
+    records_data: List[FrontHouseRecordCreate],
+    client_id: uuid.UUID = Depends(require_client_access),
+    db: Session = Depends(get_db)
+):
+    """Create several front house records in one INSERT ... RETURNING; images are added per record afterwards"""
+    if not records_data:
+        raise HTTPException(status_code=400, detail="At least one record is required")
     
-    # Handle image uploads
-    image_urls = []
-    if images:
-        for image in images:
-            ext = Path(image.filename).suffix or ".jpg"
-            filename = f"{uuid.uuid4()}{ext}"
-            filepath = UPLOAD_DIR / filename
-            
-            with filepath.open("wb") as f:
-                shutil.copyfileobj(image.file, f)
-            
-            # Create complete image URL for database
-            image_url = f"{BASE_URL}/uploads/client_images/{filename}"
-            image_urls.append(image_url)
+    records = _insert_records(db, ClientFrontHouseRecord, client_id, records_data)
     
-    record = ClientFrontHouseRecord(
-        client_id=client_id,
-        home_visible_from_street=record_data.get('home_visible_from_street', 'No'),
-        exterior_lighting=record_data.get('exterior_lighting', 'No'),
-        surveillance_cameras=record_data.get('surveillance_cameras', 'No'),
-        motion_sensors_alarms=record_data.get('motion_sensors_alarms', 'No'),
-        ground_floor_windows_accessible=record_data.get('ground_floor_windows_accessible', 'No'),
-        bars_locks_reinforced_glass=record_data.get('bars_locks_reinforced_glass', 'No'),
-        gate_fence=record_data.get('gate_fence', 'No'),
-        obstruction_of_view=record_data.get('obstruction_of_view'),
-        security_signage=record_data.get('security_signage', 'No'),
-        real_estate_websites=record_data.get('real_estate_websites', []),
-        images=image_urls
-    )
-    db.add(record)
+    # RETURNING loaded every column; detach so the commit does not expire them and force reloads
+    db.expunge_all()
     db.commit()
-    db.refresh(record)
-    return record
+    
+    return records
 
 @router.post("/clients/{client_id}/front-house-records/{record_id}/images", tags=["Digital Recognition - Front House"])
-def upload_front_house_images(
+async def upload_front_house_images(
     client_id: uuid.UUID,
     record_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     images: List[UploadFile] = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Upload additional images to front house record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    record = db.query(ClientFrontHouseRecord).filter(
-        ClientFrontHouseRecord.id == record_id,
-        ClientFrontHouseRecord.client_id == client_id
-    ).first()
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    
-    if not images:
-        raise HTTPException(status_code=400, detail="At least one image is required")
-    
-    uploaded_urls = []
-    for image in images:
-        ext = Path(image.filename).suffix or ".jpg"
-        filename = f"{uuid.uuid4()}{ext}"
-        filepath = UPLOAD_DIR / filename
-        
-        with filepath.open("wb") as f:
-            shutil.copyfileobj(image.file, f)
-        
-        # Create complete image URL for database
-        image_url = f"{BASE_URL}/uploads/client_images/{filename}"
-        uploaded_urls.append(image_url)
-    
-    # Update record with new image URLs
-    current_images = record.images or []
-    record.images = current_images + uploaded_urls
-    record.updated_at = datetime.now(timezone.utc)
-    
-    db.commit()
-    db.refresh(record)
-    
-    return {
-        "success": True,
-        "message": f"Uploaded {len(uploaded_urls)} image(s)",
-        "image_urls": uploaded_urls,
-        "record": record
-    }
+    return await _upload_record_images(db, ClientFrontHouseRecord, FrontHouseRecordResponse, client_id, record_id, images, current_user, background_tasks)
 
 @router.put("/clients/{client_id}/front-house-records/{record_id}", response_model=FrontHouseRecordResponse, tags=["Digital Recognition - Front House"])
 def update_front_house_record(
     client_id: uuid.UUID,
     record_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     data: str = Form(...),
     images: List[UploadFile] = File(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update a front house record"""
-    record = db.query(ClientFrontHouseRecord).filter(
-        ClientFrontHouseRecord.id == record_id,
-        ClientFrontHouseRecord.client_id == client_id
-    ).first()
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    if current_user.role == "Analyst" and record.client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    update_data = json.loads(data)
-    
-    # Check if this is an inline update (single field) or modal update (multiple fields + images)
-    is_inline_update = len(update_data) == 1 and 'remaining_images' not in update_data and not images
-    
-    if is_inline_update:
-        # Handle inline update - just update the single field
-        allowed_fields = {
-            'home_visible_from_street', 'exterior_lighting', 'surveillance_cameras',
-            'motion_sensors_alarms', 'ground_floor_windows_accessible', 
-            'bars_locks_reinforced_glass', 'gate_fence', 'obstruction_of_view', 'security_signage'
-        }
-        
-        for field, value in update_data.items():
-            if field in allowed_fields:
-                setattr(record, field, value)
-        
-        record.updated_at = datetime.now(timezone.utc)
-        db.commit()
-        db.refresh(record)
-        return record
-    
-    # Handle modal update with images
-    # Store original images in memory
-    original_images = record.images or []
-    
-    # Get remaining images from frontend (after user removed some)
-    remaining_images = update_data.get('remaining_images', original_images)
-    
-    # Find images that user removed (to delete from storage)
-    removed_images = [img for img in original_images if img not in remaining_images]
-    
-    # Delete removed images from storage
-    for removed_url in removed_images:
-        try:
-            filename = Path(removed_url).name
-            file_path = UPLOAD_DIR / filename
-            if file_path.exists():
-                file_path.unlink()
-                print(f"Deleted image: {filename}")
-        except Exception as e:
-            print(f"Warning: Could not delete file {filename}: {str(e)}")
-    
-    # Upload new images
-    new_image_urls = []
-    if images:
-        for image in images:
-            ext = Path(image.filename).suffix or ".jpg"
-            filename = f"{uuid.uuid4()}{ext}"
-            filepath = UPLOAD_DIR / filename
-            
-            with filepath.open("wb") as f:
-                shutil.copyfileobj(image.file, f)
-            
-            image_url = f"{BASE_URL}/uploads/client_images/{filename}"
-            new_image_urls.append(image_url)
-            print(f"Uploaded new image: {filename}")
-    
-    # Update form fields
-    allowed_fields = {
-        'home_visible_from_street', 'exterior_lighting', 'surveillance_cameras',
-        'motion_sensors_alarms', 'ground_floor_windows_accessible', 
-        'bars_locks_reinforced_glass', 'gate_fence', 'obstruction_of_view', 'security_signage',
-        'real_estate_websites'
-    }
-    
-    for field, value in update_data.items():
-        if field in allowed_fields:
-            setattr(record, field, value)
-    
-    # Final images = remaining existing images + newly uploaded images
-    record.images = remaining_images + new_image_urls
-    record.updated_at = datetime.now(timezone.utc)
-    
-    db.commit()
-    db.refresh(record)
-    
-    print(f"Updated record {record_id}: {len(remaining_images)} remaining + {len(new_image_urls)} new = {len(record.images)} total images")
-    return record
+    return _update_record(
+        db, ClientFrontHouseRecord, FRONT_HOUSE_INLINE, FRONT_HOUSE_MODAL,
+        client_id, record_id, data, images, current_user, background_tasks
+    )
 
 @router.delete("/clients/{client_id}/front-house-records/{record_id}", tags=["Digital Recognition - Front House"])
 def delete_front_house_record(
     client_id: uuid.UUID,
     record_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a front house record"""
-    record = db.query(ClientFrontHouseRecord).filter(
-        ClientFrontHouseRecord.id == record_id,
-        ClientFrontHouseRecord.client_id == client_id
-    ).first()
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    if current_user.role == "Analyst" and record.client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Delete associated image files
-    if record.images:
-        for image_url in record.images:
-            try:
-                filename = Path(image_url).name
-                file_path = UPLOAD_DIR / filename
-                if file_path.exists():
-                    file_path.unlink()
-            except Exception as e:
-                print(f"Warning: Could not delete file: {str(e)}")
-    
-    db.delete(record)
-    db.commit()
-    return {"message": "Record deleted successfully"}
+    return _delete_record(db, ClientFrontHouseRecord, client_id, record_id, current_user, background_tasks)
 
 # ==================== BACK OF HOUSE APIS ====================
 
@@ -291,237 +399,57 @@ def get_back_house_records(
     db: Session = Depends(get_db)
 ):
     """Get all back house records for a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    return db.query(ClientBackHouseRecord).filter(
-        ClientBackHouseRecord.client_id == client_id
-    ).order_by(ClientBackHouseRecord.created_at.desc()).all()
+    return _list_records(db, ClientBackHouseRecord, client_id, current_user)
 
 @router.post("/clients/{client_id}/back-house-records", response_model=BackHouseRecordResponse, tags=["Digital Recognition - Back House"])
-def create_back_house_record(
-    client_id: uuid.UUID,
+async def create_back_house_record(
+    background_tasks: BackgroundTasks,
     data: str = Form(...),
     images: List[UploadFile] = File(None),
-    current_user: User = Depends(get_current_user),
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
     """Create a new back house record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Parse JSON data
-    record_data = json.loads(data)
-    
-    # Handle image uploads
-    image_urls = []
-    if images:
-        for image in images:
-            ext = Path(image.filename).suffix or ".jpg"
-            filename = f"{uuid.uuid4()}{ext}"
-            filepath = UPLOAD_DIR / filename
-            
-            with filepath.open("wb") as f:
-                shutil.copyfileobj(image.file, f)
-            
-            image_url = f"{BASE_URL}/uploads/client_images/{filename}"
-            image_urls.append(image_url)
-    
-    record = ClientBackHouseRecord(
-        client_id=client_id,
-        rear_entry_door=record_data.get('rear_entry_door', 'No'),
-        ground_floor_windows_accessible=record_data.get('ground_floor_windows_accessible', 'No'),
-        rear_exterior_lighting=record_data.get('rear_exterior_lighting', 'No'),
-        bars_locks_reinforced_glass=record_data.get('bars_locks_reinforced_glass', 'No'),
-        gate_fence=record_data.get('gate_fence', 'No'),
-        obstruction_of_view=record_data.get('obstruction_of_view'),
-        surveillance_cameras=record_data.get('surveillance_cameras', 'No'),
-        landscaping_concealment=record_data.get('landscaping_concealment', 'None'),
-        outbuildings_visible=record_data.get('outbuildings_visible', 'No'),
-        pet_door_present=record_data.get('pet_door_present', 'No'),
-        real_estate_websites=record_data.get('real_estate_websites', []),
-        images=image_urls
-    )
-    db.add(record)
-    db.commit()
-    db.refresh(record)
-    return record
+    return await _create_record(db, ClientBackHouseRecord, BACK_HOUSE_FIELDS, client_id, data, images, background_tasks)
 
 @router.post("/clients/{client_id}/back-house-records/{record_id}/images", tags=["Digital Recognition - Back House"])
-def upload_back_house_images(
+async def upload_back_house_images(
     client_id: uuid.UUID,
     record_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     images: List[UploadFile] = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Upload additional images to back house record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    record = db.query(ClientBackHouseRecord).filter(
-        ClientBackHouseRecord.id == record_id,
-        ClientBackHouseRecord.client_id == client_id
-    ).first()
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    
-    if not images:
-        raise HTTPException(status_code=400, detail="At least one image is required")
-    
-    uploaded_urls = []
-    for image in images:
-        ext = Path(image.filename).suffix or ".jpg"
-        filename = f"{uuid.uuid4()}{ext}"
-        filepath = UPLOAD_DIR / filename
-        
-        with filepath.open("wb") as f:
-            shutil.copyfileobj(image.file, f)
-        
-        image_url = f"{BASE_URL}/uploads/client_images/{filename}"
-        uploaded_urls.append(image_url)
-    
-    # Update record with new image URLs
-    current_images = record.images or []
-    record.images = current_images + uploaded_urls
-    record.updated_at = datetime.now(timezone.utc)
-    
-    db.commit()
-    db.refresh(record)
-    
-    return {
-        "success": True,
-        "message": f"Uploaded {len(uploaded_urls)} image(s)",
-        "image_urls": uploaded_urls,
-        "record": record
-    }
+    return await _upload_record_images(db, ClientBackHouseRecord, BackHouseRecordResponse, client_id, record_id, images, current_user, background_tasks)
 
 @router.put("/clients/{client_id}/back-house-records/{record_id}", response_model=BackHouseRecordResponse, tags=["Digital Recognition - Back House"])
 def update_back_house_record(
     client_id: uuid.UUID,
     record_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     data: str = Form(...),
     images: List[UploadFile] = File(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update a back house record"""
-    record = db.query(ClientBackHouseRecord).filter(
-        ClientBackHouseRecord.id == record_id,
-        ClientBackHouseRecord.client_id == client_id
-    ).first()
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    if current_user.role == "Analyst" and record.client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    update_data = json.loads(data)
-    
-    # Check if this is an inline update (single field) or modal update (multiple fields + images)
-    is_inline_update = len(update_data) == 1 and 'remaining_images' not in update_data and not images
-    
-    if is_inline_update:
-        # Handle inline update - just update the single field
-        allowed_fields = {
-            'rear_entry_door', 'ground_floor_windows_accessible', 'rear_exterior_lighting',
-            'bars_locks_reinforced_glass', 'gate_fence', 'obstruction_of_view',
-            'surveillance_cameras', 'landscaping_concealment', 'outbuildings_visible', 'pet_door_present'
-        }
-        
-        for field, value in update_data.items():
-            if field in allowed_fields:
-                setattr(record, field, value)
-        
-        record.updated_at = datetime.now(timezone.utc)
-        db.commit()
-        db.refresh(record)
-        return record
-    
-    # Handle modal update with images
-    # Store original images in memory
-    original_images = record.images or []
-    
-    # Get remaining images from frontend (after user removed some)
-    remaining_images = update_data.get('remaining_images', original_images)
-    
-    # Find images that user removed (to delete from storage)
-    removed_images = [img for img in original_images if img not in remaining_images]
-    
-    # Delete removed images from storage
-    for removed_url in removed_images:
-        try:
-            filename = Path(removed_url).name
-            file_path = UPLOAD_DIR / filename
-            if file_path.exists():
-                file_path.unlink()
-                print(f"Deleted image: {filename}")
-        except Exception as e:
-            print(f"Warning: Could not delete file {filename}: {str(e)}")
-    
-    # Upload new images
-    new_image_urls = []
-    if images:
-        for image in images:
-            ext = Path(image.filename).suffix or ".jpg"
-            filename = f"{uuid.uuid4()}{ext}"
-            filepath = UPLOAD_DIR / filename
-            
-            with filepath.open("wb") as f:
-                shutil.copyfileobj(image.file, f)
-            
-            image_url = f"{BASE_URL}/uploads/client_images/{filename}"
-            new_image_urls.append(image_url)
-            print(f"Uploaded new image: {filename}")
-    
-    # Update form fields
-    allowed_fields = {
-        'rear_entry_door', 'ground_floor_windows_accessible', 'rear_exterior_lighting',
-        'bars_locks_reinforced_glass', 'gate_fence', 'obstruction_of_view',
-        'surveillance_cameras', 'landscaping_concealment', 'outbuildings_visible', 'pet_door_present',
-        'real_estate_websites'
-    }
-    
-    for field, value in update_data.items():
-        if field in allowed_fields:
-            setattr(record, field, value)
-    
-    # Final images = remaining existing images + newly uploaded images
-    record.images = remaining_images + new_image_urls
-    record.updated_at = datetime.now(timezone.utc)
-    
-    db.commit()
-    db.refresh(record)
-    
-    print(f"Updated back house record {record_id}: {len(remaining_images)} remaining + {len(new_image_urls)} new = {len(record.images)} total images")
-    return record
+    return _update_record(
+        db, ClientBackHouseRecord, BACK_HOUSE_INLINE, BACK_HOUSE_MODAL,
+        client_id, record_id, data, images, current_user, background_tasks
+    )
 
 @router.delete("/clients/{client_id}/back-house-records/{record_id}", tags=["Digital Recognition - Back House"])
 def delete_back_house_record(
     client_id: uuid.UUID,
     record_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a back house record"""
-    record = db.query(ClientBackHouseRecord).filter(
-        ClientBackHouseRecord.id == record_id,
-        ClientBackHouseRecord.client_id == client_id
-    ).first()
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    if current_user.role == "Analyst" and record.client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    db.delete(record)
-    db.commit()
-    return {"message": "Record deleted successfully"}
+    return _delete_record(db, ClientBackHouseRecord, client_id, record_id, current_user, background_tasks)
 
 # ==================== INSIDE HOUSE APIS ====================
 
@@ -532,209 +460,57 @@ def get_inside_house_records(
     db: Session = Depends(get_db)
 ):
     """Get all inside house records for a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    return db.query(ClientInsideHouseRecord).filter(
-        ClientInsideHouseRecord.client_id == client_id
-    ).order_by(ClientInsideHouseRecord.created_at.desc()).all()
+    return _list_records(db, ClientInsideHouseRecord, client_id, current_user)
 
 @router.post("/clients/{client_id}/inside-house-records", response_model=InsideHouseRecordResponse, tags=["Digital Recognition - Inside House"])
-def create_inside_house_record(
-    client_id: uuid.UUID,
+async def create_inside_house_record(
+    background_tasks: BackgroundTasks,
     data: str = Form(...),
     images: List[UploadFile] = File(None),
-    current_user: User = Depends(get_current_user),
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
     """Create a new inside house record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Parse JSON data
-    record_data = json.loads(data)
-    
-    # Handle image uploads
-    image_urls = []
-    if images:
-        for image in images:
-            ext = Path(image.filename).suffix or ".jpg"
-            filename = f"{uuid.uuid4()}{ext}"
-            filepath = UPLOAD_DIR / filename
-            
-            with filepath.open("wb") as f:
-                shutil.copyfileobj(image.file, f)
-            
-            image_url = f"{BASE_URL}/uploads/client_images/{filename}"
-            image_urls.append(image_url)
-    
-    record = ClientInsideHouseRecord(
-        client_id=client_id,
-        layout_exposure=record_data.get('layout_exposure'),
-        real_estate_websites=record_data.get('real_estate_websites', []),
-        images=image_urls
-    )
-    db.add(record)
-    db.commit()
-    db.refresh(record)
-    return record
+    return await _create_record(db, ClientInsideHouseRecord, INSIDE_HOUSE_FIELDS, client_id, data, images, background_tasks)
 
 @router.post("/clients/{client_id}/inside-house-records/{record_id}/images", tags=["Digital Recognition - Inside House"])
-def upload_inside_house_images(
+async def upload_inside_house_images(
     client_id: uuid.UUID,
     record_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     images: List[UploadFile] = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Upload additional images to inside house record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    record = db.query(ClientInsideHouseRecord).filter(
-        ClientInsideHouseRecord.id == record_id,
-        ClientInsideHouseRecord.client_id == client_id
-    ).first()
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    
-    if not images:
-        raise HTTPException(status_code=400, detail="At least one image is required")
-    
-    uploaded_urls = []
-    for image in images:
-        ext = Path(image.filename).suffix or ".jpg"
-        filename = f"{uuid.uuid4()}{ext}"
-        filepath = UPLOAD_DIR / filename
-        
-        with filepath.open("wb") as f:
-            shutil.copyfileobj(image.file, f)
-        
-        image_url = f"{BASE_URL}/uploads/client_images/{filename}"
-        uploaded_urls.append(image_url)
-    
-    # Update record with new image URLs
-    current_images = record.images or []
-    record.images = current_images + uploaded_urls
-    record.updated_at = datetime.now(timezone.utc)
-    
-    db.commit()
-    db.refresh(record)
-    
-    return {
-        "success": True,
-        "message": f"Uploaded {len(uploaded_urls)} image(s)",
-        "image_urls": uploaded_urls,
-        "record": record
-    }
+    return await _upload_record_images(db, ClientInsideHouseRecord, InsideHouseRecordResponse, client_id, record_id, images, current_user, background_tasks)
 
 @router.put("/clients/{client_id}/inside-house-records/{record_id}", response_model=InsideHouseRecordResponse, tags=["Digital Recognition - Inside House"])
 def update_inside_house_record(
     client_id: uuid.UUID,
     record_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     data: str = Form(...),
     images: List[UploadFile] = File(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update an inside house record"""
-    record = db.query(ClientInsideHouseRecord).filter(
-        ClientInsideHouseRecord.id == record_id,
-        ClientInsideHouseRecord.client_id == client_id
-    ).first()
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    if current_user.role == "Analyst" and record.client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    update_data = json.loads(data)
-    
-    # Check if this is an inline update (single field) or modal update (multiple fields + images)
-    is_inline_update = len(update_data) == 1 and 'remaining_images' not in update_data and not images
-    
-    if is_inline_update:
-        # Handle inline update - just update the single field
-        allowed_fields = {'layout_exposure'}
-        
-        for field, value in update_data.items():
-            if field in allowed_fields:
-                setattr(record, field, value)
-        
-        record.updated_at = datetime.now(timezone.utc)
-        db.commit()
-        db.refresh(record)
-        return record
-    
-    # Handle modal update with images
-    original_images = record.images or []
-    remaining_images = update_data.get('remaining_images', original_images)
-    removed_images = [img for img in original_images if img not in remaining_images]
-    
-    # Delete removed images from storage
-    for removed_url in removed_images:
-        try:
-            filename = Path(removed_url).name
-            file_path = UPLOAD_DIR / filename
-            if file_path.exists():
-                file_path.unlink()
-        except Exception as e:
-            print(f"Warning: Could not delete file {filename}: {str(e)}")
-    
-    # Upload new images
-    new_image_urls = []
-    if images:
-        for image in images:
-            ext = Path(image.filename).suffix or ".jpg"
-            filename = f"{uuid.uuid4()}{ext}"
-            filepath = UPLOAD_DIR / filename
-            
-            with filepath.open("wb") as f:
-                shutil.copyfileobj(image.file, f)
-            
-            image_url = f"{BASE_URL}/uploads/client_images/{filename}"
-            new_image_urls.append(image_url)
-    
-    # Update fields
-    allowed_fields = {'layout_exposure', 'real_estate_websites'}
-    for field, value in update_data.items():
-        if field in allowed_fields:
-            setattr(record, field, value)
-    
-    # Final images = remaining + new
-    record.images = remaining_images + new_image_urls
-    record.updated_at = datetime.now(timezone.utc)
-    
-    db.commit()
-    db.refresh(record)
-    return record
+    return _update_record(
+        db, ClientInsideHouseRecord, INSIDE_HOUSE_INLINE, INSIDE_HOUSE_MODAL,
+        client_id, record_id, data, images, current_user, background_tasks
+    )
 
 @router.delete("/clients/{client_id}/inside-house-records/{record_id}", tags=["Digital Recognition - Inside House"])
 def delete_inside_house_record(
     client_id: uuid.UUID,
     record_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete an inside house record"""
-    record = db.query(ClientInsideHouseRecord).filter(
-        ClientInsideHouseRecord.id == record_id,
-        ClientInsideHouseRecord.client_id == client_id
-    ).first()
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    if current_user.role == "Analyst" and record.client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    db.delete(record)
-    db.commit()
-    return {"message": "Record deleted successfully"}
+    return _delete_record(db, ClientInsideHouseRecord, client_id, record_id, current_user, background_tasks)
 
 # ==================== GOOGLE STREET VIEW APIS ====================
 
@@ -745,222 +521,54 @@ def get_google_street_view_records(
     db: Session = Depends(get_db)
 ):
     """Get all Google Street View records for a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    return db.query(ClientGoogleStreetViewRecord).filter(
-        ClientGoogleStreetViewRecord.client_id == client_id
-    ).order_by(ClientGoogleStreetViewRecord.created_at.desc()).all()
+    return _list_records(db, ClientGoogleStreetViewRecord, client_id, current_user)
 
 @router.post("/clients/{client_id}/google-street-view-records", response_model=GoogleStreetViewRecordResponse, tags=["Digital Recognition - Google Street View"])
-def create_google_street_view_record(
-    client_id: uuid.UUID,
+async def create_google_street_view_record(
+    background_tasks: BackgroundTasks,
     data: str = Form(...),
     images: List[UploadFile] = File(None),
-    current_user: User = Depends(get_current_user),
+    client_id: uuid.UUID = Depends(require_client_access),
     db: Session = Depends(get_db)
 ):
     """Create a new Google Street View record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Parse JSON data
-    record_data = json.loads(data)
-    
-    # Handle image uploads
-    image_urls = []
-    if images:
-        for image in images:
-            ext = Path(image.filename).suffix or ".jpg"
-            filename = f"{uuid.uuid4()}{ext}"
-            filepath = UPLOAD_DIR / filename
-            
-            with filepath.open("wb") as f:
-                shutil.copyfileobj(image.file, f)
-            
-            image_url = f"{BASE_URL}/uploads/client_images/{filename}"
-            image_urls.append(image_url)
-    
-    record = ClientGoogleStreetViewRecord(
-        client_id=client_id,
-        home_visible_from_street=record_data.get('home_visible_from_street'),
-        exterior_lighting=record_data.get('exterior_lighting'),
-        surveillance_cameras=record_data.get('surveillance_cameras'),
-        motion_sensors_alarms=record_data.get('motion_sensors_alarms'),
-        ground_floor_windows_accessible=record_data.get('ground_floor_windows_accessible'),
-        bars_locks_reinforced_glass=record_data.get('bars_locks_reinforced_glass'),
-        gate_fence=record_data.get('gate_fence'),
-        obstruction_of_view=record_data.get('obstruction_of_view'),
-        security_signage=record_data.get('security_signage'),
-        real_estate_websites=record_data.get('real_estate_websites', []),
-        images=image_urls
-    )
-    db.add(record)
-    db.commit()
-    db.refresh(record)
-    return record
+    return await _create_record(db, ClientGoogleStreetViewRecord, STREET_VIEW_FIELDS, client_id, data, images, background_tasks)
 
 @router.post("/clients/{client_id}/google-street-view-records/{record_id}/images", tags=["Digital Recognition - Google Street View"])
-def upload_google_street_view_images(
+async def upload_google_street_view_images(
     client_id: uuid.UUID,
     record_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     images: List[UploadFile] = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Upload additional images to Google Street View record"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    record = db.query(ClientGoogleStreetViewRecord).filter(
-        ClientGoogleStreetViewRecord.id == record_id,
-        ClientGoogleStreetViewRecord.client_id == client_id
-    ).first()
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    
-    if not images:
-        raise HTTPException(status_code=400, detail="At least one image is required")
-    
-    uploaded_urls = []
-    for image in images:
-        ext = Path(image.filename).suffix or ".jpg"
-        filename = f"{uuid.uuid4()}{ext}"
-        filepath = UPLOAD_DIR / filename
-        
-        with filepath.open("wb") as f:
-            shutil.copyfileobj(image.file, f)
-        
-        image_url = f"{BASE_URL}/uploads/client_images/{filename}"
-        uploaded_urls.append(image_url)
-    
-    # Update record with new image URLs
-    current_images = record.images or []
-    record.images = current_images + uploaded_urls
-    record.updated_at = datetime.now(timezone.utc)
-    
-    db.commit()
-    db.refresh(record)
-    
-    return {
-        "success": True,
-        "message": f"Uploaded {len(uploaded_urls)} image(s)",
-        "image_urls": uploaded_urls,
-        "record": record
-    }
+    return await _upload_record_images(db, ClientGoogleStreetViewRecord, GoogleStreetViewRecordResponse, client_id, record_id, images, current_user, background_tasks)
 
 @router.put("/clients/{client_id}/google-street-view-records/{record_id}", response_model=GoogleStreetViewRecordResponse, tags=["Digital Recognition - Google Street View"])
 def update_google_street_view_record(
     client_id: uuid.UUID,
     record_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     data: str = Form(...),
     images: List[UploadFile] = File(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update a Google Street View record"""
-    record = db.query(ClientGoogleStreetViewRecord).filter(
-        ClientGoogleStreetViewRecord.id == record_id,
-        ClientGoogleStreetViewRecord.client_id == client_id
-    ).first()
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    if current_user.role == "Analyst" and record.client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    update_data = json.loads(data)
-    
-    # Check if this is an inline update (single field) or modal update (multiple fields + images)
-    is_inline_update = len(update_data) == 1 and 'remaining_images' not in update_data and not images
-    
-    if is_inline_update:
-        # Handle inline update - just update the single field
-        allowed_fields = {
-            'home_visible_from_street', 'exterior_lighting', 'surveillance_cameras',
-            'motion_sensors_alarms', 'ground_floor_windows_accessible', 
-            'bars_locks_reinforced_glass', 'gate_fence', 'obstruction_of_view', 'security_signage'
-        }
-        
-        for field, value in update_data.items():
-            if field in allowed_fields:
-                setattr(record, field, value)
-        
-        record.updated_at = datetime.now(timezone.utc)
-        db.commit()
-        db.refresh(record)
-        return record
-    
-    # Handle modal update with images
-    original_images = record.images or []
-    remaining_images = update_data.get('remaining_images', original_images)
-    removed_images = [img for img in original_images if img not in remaining_images]
-    
-    # Delete removed images from storage
-    for removed_url in removed_images:
-        try:
-            filename = Path(removed_url).name
-            file_path = UPLOAD_DIR / filename
-            if file_path.exists():
-                file_path.unlink()
-        except Exception as e:
-            print(f"Warning: Could not delete file {filename}: {str(e)}")
-    
-    # Upload new images
-    new_image_urls = []
-    if images:
-        for image in images:
-            ext = Path(image.filename).suffix or ".jpg"
-            filename = f"{uuid.uuid4()}{ext}"
-            filepath = UPLOAD_DIR / filename
-            
-            with filepath.open("wb") as f:
-                shutil.copyfileobj(image.file, f)
-            
-            image_url = f"{BASE_URL}/uploads/client_images/{filename}"
-            new_image_urls.append(image_url)
-    
-    # Update fields
-    allowed_fields = {
-        'home_visible_from_street', 'exterior_lighting', 'surveillance_cameras',
-        'motion_sensors_alarms', 'ground_floor_windows_accessible', 
-        'bars_locks_reinforced_glass', 'gate_fence', 'obstruction_of_view', 'security_signage'
-    }
-    for field, value in update_data.items():
-        if field in allowed_fields:
-            setattr(record, field, value)
-    
-    # Final images = remaining + new
-    record.images = remaining_images + new_image_urls
-    record.updated_at = datetime.now(timezone.utc)
-    
-    db.commit()
-    db.refresh(record)
-    return record
+    return _update_record(
+        db, ClientGoogleStreetViewRecord, STREET_VIEW_INLINE, STREET_VIEW_MODAL,
+        client_id, record_id, data, images, current_user, background_tasks
+    )
 
 @router.delete("/clients/{client_id}/google-street-view-records/{record_id}", tags=["Digital Recognition - Google Street View"])
 def delete_google_street_view_record(
     client_id: uuid.UUID,
     record_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a Google Street View record"""
-    record = db.query(ClientGoogleStreetViewRecord).filter(
-        ClientGoogleStreetViewRecord.id == record_id,
-        ClientGoogleStreetViewRecord.client_id == client_id
-    ).first()
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    if current_user.role == "Analyst" and record.client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    db.delete(record)
-    db.commit()
-    return {"message": "Record deleted successfully"}
+    return _delete_record(db, ClientGoogleStreetViewRecord, client_id, record_id, current_user, background_tasks)
@@ -1,61 +1,46 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import exists, select
 from sqlalchemy.orm import Session
 import uuid
-import requests
+import orjson
 
 from database import get_db
-from models import Client, User, ClientEmail, ClientPhoneNumber, ClientAddress
+from models import User, ClientEmail, ClientPhoneNumber, ClientAddress
 from users import get_current_user
+from deps import authorize_client
+from webhooks import post_webhook
 
 router = APIRouter()
 
-@router.post("/clients/{client_id}/generate-document", tags=["Document Generation"])
-def generate_document(
-    client_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Generate document by sending client ID to webhook"""
-    
-    # Check client exists and user has access
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
+GENERATE_DOCUMENT_WEBHOOK_URL = "https://obscureiq.app.n8n.cloud/webhook/c6cd3dab-bf74-4e93-98b3-6a1da378b730"
 
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+def _check_document_prerequisites(db: Session, client_id: uuid.UUID, current_user: User) -> None:
+    """Raise unless the user may access the client and it has client-provided contact data"""
     
-    # Check for at least one client-provided email (status = "Client Provided")
-    client_provided_email = db.query(ClientEmail).filter(
-        ClientEmail.client_id == client_id,
-        ClientEmail.status == "Client Provided"
-    ).first()
-    
-    # Check for at least one client-provided phone number (client_provided = "Yes")
-    client_provided_phone = db.query(ClientPhoneNumber).filter(
-        ClientPhoneNumber.client_id == client_id,
-        ClientPhoneNumber.client_provided == "Yes"
-    ).first()
+    # Check client exists and user has access
+    authorize_client(db, client_id, current_user)
     
-    # Check for at least one client-provided address (client_provided = "Yes")
-    client_provided_address = db.query(ClientAddress).filter(
-        ClientAddress.client_id == client_id,
-        ClientAddress.client_provided == "Yes"
-    ).first()
+    # Check for at least one client-provided email, phone number and address, in one round trip
+    has_email, has_phone, has_address = db.execute(select(
+        exists().where(ClientEmail.client_id == client_id, ClientEmail.status == "Client Provided"),
+        exists().where(ClientPhoneNumber.client_id == client_id, ClientPhoneNumber.client_provided == "Yes"),
+        exists().where(ClientAddress.client_id == client_id, ClientAddress.client_provided == "Yes")
+    )).one()
     
     # Debug logging
     print(f"Client {client_id} validation:")
-    print(f"- Client provided email: {bool(client_provided_email)}")
-    print(f"- Client provided phone: {bool(client_provided_phone)}")
-    print(f"- Client provided address: {bool(client_provided_address)}")
+    print(f"- Client provided email: {has_email}")
+    print(f"- Client provided phone: {has_phone}")
+    print(f"- Client provided address: {has_address}")
     
     # Validate that ALL three client-provided data types exist
     missing_data = []
-    if not client_provided_email:
+    if not has_email:
         missing_data.append("client-provided email")
-    if not client_provided_phone:
+    if not has_phone:
         missing_data.append("client-provided phone number")
-    if not client_provided_address:
+    if not has_address:
         missing_data.append("client-provided address")
     
     if missing_data:
@@ -65,27 +50,35 @@ def generate_document(
             detail=f"Please add at least one client provided phone number,email and address"
         )
 
-    webhook_url = "https://obscureiq.app.n8n.cloud/webhook/c6cd3dab-bf74-4e93-98b3-6a1da378b730"
+async def _notify_generate_document_webhook(client_id: uuid.UUID, payload: bytes) -> None:
+    """Ask n8n to generate the document after the response is sent, logging failures"""
+    try:
+        status_code, _ = await post_webhook(GENERATE_DOCUMENT_WEBHOOK_URL, payload, retry=False)
+        if status_code != 200:
+            print(f"Warning: Document generation webhook for client {client_id} failed with status {status_code}")
+    except Exception as e:
+        print(f"Warning: Document generation webhook failed for client {client_id}: {str(e)}")
+
+@router.post("/clients/{client_id}/generate-document", status_code=202, tags=["Document Generation"])
+async def generate_document(
+    client_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Validate the client, then trigger document generation through the webhook after responding"""
+    
+    await run_in_threadpool(_check_document_prerequisites, db, client_id, current_user)
     
-    payload = {
+    payload = orjson.dumps({
+        "client_id": str(client_id)
+    })
+    
+    # n8n only starts the workflow, so the response need not wait for it
+    background_tasks.add_task(_notify_generate_document_webhook, client_id, payload)
+    
+    return {
+        "message": "Document generation initiated successfully",
+        "status": "success",
         "client_id": str(client_id)
     }
-
-    try:
-        response = requests.post(webhook_url, json=payload, timeout=30)
-        
-        if response.status_code == 200:
-            return {
-                "message": "Document generation initiated successfully",
-                "status": "success",
-                "client_id": str(client_id)
-            }
-        else:
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Webhook failed with status {response.status_code}"
-            )
-    except requests.exceptions.Timeout:
-        raise HTTPException(status_code=500, detail="Webhook request timed out")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to send to webhook: {str(e)}")
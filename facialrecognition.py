@@ -1,29 +1,53 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime, timezone
 from pathlib import Path
 import uuid
-import shutil
-import requests
-import os
+from secrets import token_hex
+import orjson
 
 from database import get_db
-from models import Client, ClientFacialRecognitionURL, ClientFacialRecognitionSite, User
+from models import ClientFacialRecognitionURL, ClientFacialRecognitionSite, User
 from schemas import (
     FacialRecognitionCreate, FacialRecognitionUpdate, FacialRecognitionResponse,
     FacialRecognitionBulkUpload, FacialRecognitionSiteResponse
 )
 from users import get_current_user
+from deps import authorize_client, get_authorized_record
+from uploads import safe_unlink, save_upload, save_uploads_concurrently, validate_image
+from urls import client_image_url
+from webhooks import WebhookUnavailable, post_json_webhook
 
 router = APIRouter()
-BASE_URL = "https://obsecureiqbackendv1-production-e750.up.railway.app"
+
+FACIAL_URLS_WEBHOOK_URL = "https://obscureiq.app.n8n.cloud/webhook/25c6e6ed-d58b-4e0b-a7cf-0347b14e2771"
 
 
 # Upload directory setup
 UPLOAD_DIR = Path("uploads/client_images")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+def _save_image(image: UploadFile) -> str:
+    """Save an uploaded image under a new name and return its public URL"""
+    ext = Path(image.filename).suffix or ".jpg"
+    filename = f"{token_hex(16)}{ext}"
+    save_upload(image, UPLOAD_DIR / filename)
+    
+    return client_image_url(filename)
+
+def _unlink_images(image_urls: List[str]) -> None:
+    """Remove stored site images from disk"""
+    for image_url in image_urls:
+        safe_unlink(UPLOAD_DIR / Path(image_url).name)
+
+def _save_record(db: Session, record):
+    """Commit a new or changed record and reload its server-generated columns"""
+    db.add(record)
+    db.commit()
+    db.refresh(record)
+    return record
+
 # ==================== FACIAL RECOGNITION URL APIS ====================
 
 @router.get("/clients/{client_id}/facial-recognition-urls", response_model=List[FacialRecognitionResponse], tags=["Facial Recognition - URLs"])
@@ -33,12 +57,7 @@ def get_facial_recognition_urls(
     db: Session = Depends(get_db)
 ):
     """Get all facial recognition URLs for a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     return db.query(ClientFacialRecognitionURL).filter(
         ClientFacialRecognitionURL.client_id == client_id
@@ -52,12 +71,7 @@ def add_facial_recognition_url(
     db: Session = Depends(get_db)
 ):
     """Add a new facial recognition URL"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     if not data.url.strip():
         raise HTTPException(status_code=400, detail="URL cannot be empty")
@@ -82,12 +96,7 @@ def update_facial_recognition_url(
     db: Session = Depends(get_db)
 ):
     """Update a facial recognition URL"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     record = db.query(ClientFacialRecognitionURL).filter(
         ClientFacialRecognitionURL.id == url_id,
@@ -101,7 +110,6 @@ def update_facial_recognition_url(
         raise HTTPException(status_code=400, detail="URL cannot be empty")
 
     record.url = data.url.strip()
-    record.updated_at = datetime.now(timezone.utc)
 
     db.commit()
     db.refresh(record)
@@ -116,12 +124,7 @@ def delete_facial_recognition_url(
     db: Session = Depends(get_db)
 ):
     """Delete a facial recognition URL"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     record = db.query(ClientFacialRecognitionURL).filter(
         ClientFacialRecognitionURL.id == url_id,
@@ -137,7 +140,7 @@ def delete_facial_recognition_url(
     return {"message": "Facial recognition URL deleted successfully"}
 
 @router.post("/clients/{client_id}/facial-recognition-urls/bulk-upload", tags=["Facial Recognition - URLs"])
-def bulk_upload_facial_urls(
+async def bulk_upload_facial_urls(
     client_id: uuid.UUID,
     data: FacialRecognitionBulkUpload,
     current_user: User = Depends(get_current_user),
@@ -146,45 +149,37 @@ def bulk_upload_facial_urls(
     """Send raw facial recognition URLs to n8n and return actual result"""
     
     # Check client
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    webhook_url = "https://obscureiq.app.n8n.cloud/webhook/25c6e6ed-d58b-4e0b-a7cf-0347b14e2771"
+    await run_in_threadpool(authorize_client, db, client_id, current_user)
     
-    payload = {
+    payload = orjson.dumps({
         "urls": data.urls_text,
         "client_id": str(client_id)
-    }
+    })
 
     try:
-        response = requests.post(webhook_url, json=payload, timeout=60)
-
         # n8n ALWAYS returns JSON because responseMode = "responseNode"
-        n8n_result = response.json()
-
-        # SUCCESS CASE from n8n
-        if (
-            n8n_result.get("status") == "Success"
-            or n8n_result.get("success") is True
-        ):
-            return {
-                "status": "success",
-                "message": n8n_result.get("message", "Facial URLs added successfully")
-            }
-
-        # ERROR CASE (n8n returned failure)
-        raise HTTPException(
-            status_code=400,
-            detail=n8n_result.get("message", "Failed to insert facial recognition URLs")
-        )
-
+        n8n_result = await post_json_webhook(FACIAL_URLS_WEBHOOK_URL, payload)
+    except WebhookUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    # SUCCESS CASE from n8n
+    if (
+        n8n_result.get("status") == "Success"
+        or n8n_result.get("success") is True
+    ):
+        return {
+            "status": "success",
+            "message": n8n_result.get("message", "Facial URLs added successfully")
+        }
+
+    # ERROR CASE (n8n returned failure)
+    raise HTTPException(
+        status_code=400,
+        detail=n8n_result.get("message", "Failed to insert facial recognition URLs")
+    )
+
 # ==================== FACIAL RECOGNITION SITES APIS ====================
 
 @router.get("/clients/{client_id}/facial-recognition-sites", response_model=List[FacialRecognitionSiteResponse], tags=["Facial Recognition - Sites"])
@@ -194,19 +189,14 @@ def get_facial_recognition_sites(
     db: Session = Depends(get_db)
 ):
     """Get all facial recognition sites for a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    authorize_client(db, client_id, current_user)
 
     return db.query(ClientFacialRecognitionSite).filter(
         ClientFacialRecognitionSite.client_id == client_id
     ).order_by(ClientFacialRecognitionSite.created_at.desc()).all()
 
 @router.post("/clients/{client_id}/facial-recognition-sites", tags=["Facial Recognition - Sites"])
-def create_facial_recognition_sites(
+async def create_facial_recognition_sites(
     client_id: uuid.UUID,
     site_name: str = Form(...),
     images: List[UploadFile] = File(...),
@@ -220,25 +210,14 @@ def create_facial_recognition_sites(
     if not images:
         raise HTTPException(status_code=400, detail="At least one image is required")
 
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    image_urls = []
-
+    # Reject the whole request before any disk write if one file is invalid
     for image in images:
-        ext = Path(image.filename).suffix or ".jpg"
-        filename = f"{uuid.uuid4()}{ext}"
-        path = UPLOAD_DIR / filename
+        validate_image(image)
 
-        with path.open("wb") as f:
-            shutil.copyfileobj(image.file, f)
+    await run_in_threadpool(authorize_client, db, client_id, current_user)
 
-        url = f"{BASE_URL}/uploads/client_images/{filename}"
-        image_urls.append(url)
+    # Save all images concurrently, off the event loop
+    image_urls = await save_uploads_concurrently(_save_image, images)
 
     # Create a single record with multiple images
     record = ClientFacialRecognitionSite(
@@ -247,9 +226,7 @@ def create_facial_recognition_sites(
         images=image_urls  # Store array of images
     )
 
-    db.add(record)
-    db.commit()
-    db.refresh(record)
+    record = await run_in_threadpool(_save_record, db, record)
 
     return {
         "message": f"Facial recognition site created with {len(image_urls)} image(s)",
@@ -262,9 +239,10 @@ def create_facial_recognition_sites(
     }
 
 @router.put("/clients/{client_id}/facial-recognition-sites/{record_id}", tags=["Facial Recognition - Sites"])
-def update_facial_recognition_site(
+async def update_facial_recognition_site(
     client_id: uuid.UUID,
     record_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     data: str = Form(...),
     images: List[UploadFile] = File(None),
     current_user: User = Depends(get_current_user),
@@ -272,25 +250,18 @@ def update_facial_recognition_site(
 ):
     """Update a facial recognition site with multiple images"""
     
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
+    # Reject the whole request before any disk write if one file is invalid
+    for image in images or []:
+        validate_image(image)
     
-    if current_user.role == "Analyst" and client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    record = db.query(ClientFacialRecognitionSite).filter(
-        ClientFacialRecognitionSite.id == record_id,
-        ClientFacialRecognitionSite.client_id == client_id
-    ).first()
-    
-    if not record:
-        raise HTTPException(status_code=404, detail="Facial recognition site not found")
+    record = await run_in_threadpool(
+        get_authorized_record, db, ClientFacialRecognitionSite, record_id, client_id, current_user,
+        "Facial recognition site not found"
+    )
     
     try:
-        import json
-        record_data = json.loads(data)
-    except json.JSONDecodeError:
+        record_data = orjson.loads(data)
+    except orjson.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON data")
     
     # Update site name
@@ -299,41 +270,21 @@ def update_facial_recognition_site(
         raise HTTPException(status_code=400, detail="Site name cannot be empty")
     record.site_name = site_name.strip()
     
-    # Handle images
-    remaining_images = record_data.get('remaining_images', [])
-    
-    # Delete removed images from filesystem
-    if record.images:
-        for old_image_url in record.images:
-            if old_image_url not in remaining_images:
-                try:
-                    old_path = UPLOAD_DIR / Path(old_image_url).name
-                    if old_path.exists():
-                        old_path.unlink()
-                except Exception as e:
-                    print(f"Warning: Could not delete old image: {str(e)}")
-    
-    # Start with remaining images
-    final_images = remaining_images.copy()
+    # Handle images; only images already on this record may remain, so a request cannot adopt other URLs
+    original_images = {Path(img).name: img for img in record.images or []}
+    remaining_images = [
+        original_images[Path(img).name] for img in record_data.get('remaining_images', [])
+        if Path(img).name in original_images
+    ]
+    remaining_set = set(remaining_images)
+    removed_images = [img for img in original_images.values() if img not in remaining_set]
     
-    # Add new uploaded images
-    if images:
-        for image in images:
-            ext = Path(image.filename).suffix or ".jpg"
-            filename = f"{uuid.uuid4()}{ext}"
-            path = UPLOAD_DIR / filename
-
-            with path.open("wb") as f:
-                shutil.copyfileobj(image.file, f)
-
-            url = f"{BASE_URL}/uploads/client_images/{filename}"
-            final_images.append(url)
+    # Remaining images followed by the new uploads, saved concurrently
+    record.images = remaining_images + await save_uploads_concurrently(_save_image, images or [])
+    record = await run_in_threadpool(_save_record, db, record)
     
-    record.images = final_images
-    record.updated_at = datetime.now(timezone.utc)
-    
-    db.commit()
-    db.refresh(record)
+    # Delete removed images from the filesystem only once the commit succeeded, after the response is sent
+    background_tasks.add_task(_unlink_images, removed_images)
     
     return record
 
@@ -345,26 +296,10 @@ def delete_facial_recognition_site(
     db: Session = Depends(get_db)
 ):
     """Delete a facial recognition site"""
-    record = db.query(ClientFacialRecognitionSite).filter(
-        ClientFacialRecognitionSite.id == record_id,
-        ClientFacialRecognitionSite.client_id == client_id
-    ).first()
-
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-
-    if current_user.role == "Analyst" and record.client.analyst_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    record = get_authorized_record(db, ClientFacialRecognitionSite, record_id, client_id, current_user, "Record not found")
 
     # Delete all images from filesystem
-    if record.images:
-        for image_url in record.images:
-            try:
-                old_path = UPLOAD_DIR / Path(image_url).name
-                if old_path.exists():
-                    old_path.unlink()
-            except Exception as e:
-                print(f"Warning: Could not delete image: {str(e)}")
+    _unlink_images(record.images or [])
 
     db.delete(record)
     db.commit()
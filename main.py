@@ -1,4 +1,6 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
@@ -24,13 +26,12 @@ SMTP_PASSWORD = "ptnr vhac mlsl qrru"
 
 # URLs
 FRONTEND_URL = "http://localhost:3000"
-BASE_URL = "http://localhost:8000"
 
 # Default password for admin-created users
 DEFAULT_USER_PASSWORD = "Test@123"
 
 # Import database setup
-from database import create_tables
+from database import async_engine, create_tables
 
 # Import all routers
 from users import router as users_router, create_default_admin
@@ -55,11 +56,24 @@ from clientosintmodule import router as clientosintmodule_router
 from clientmatching import router as clientmatching_router
 from clientgenerateddocuments import router as clientgenerateddocuments_router
 
+from webhooks import async_webhook_client
+from uploads import MAX_REQUEST_BYTES
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close pooled webhook and async database connections on shutdown
+    await async_webhook_client.aclose()
+    await async_engine.dispose()
+
 # FastAPI setup
 app = FastAPI(
     title="ObscureIQ Backend API",
     description="Complete authentication system with client management",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # Serialize every response body with orjson
+    default_response_class=ORJSONResponse
 )
 
 # Upload directory setup
@@ -67,6 +81,17 @@ UPLOAD_DIR = Path("uploads/client_images")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    """Reject oversized bodies from Content-Length before multipart parsing spools them to disk"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_REQUEST_BYTES:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Request body exceeds the {MAX_REQUEST_BYTES // (1024 * 1024)} MB limit"}
+        )
+    return await call_next(request)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
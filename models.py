@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Text, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from sqlalchemy.orm import declarative_base, relationship, backref
 from sqlalchemy.sql import func
@@ -88,6 +88,16 @@ class ClientUsername(Base):
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
     client = relationship("Client", backref="usernames")
+    
+    __table_args__ = (
+        # Target of ON CONFLICT in add and the bulk fallback
+        Index("ux_username_client_username", "client_id", "username", unique=True),
+        # Covers every column of the list response, so paging is an index-only scan
+        Index(
+            "ix_client_username_client_created", "client_id", created_at.desc(),
+            postgresql_include=["id", "username", "updated_at"]
+        ),
+    )
 
 class ClientRelativeAssociate(Base):
     __tablename__ = "client_relatives_and_associates"
@@ -100,6 +110,13 @@ class ClientRelativeAssociate(Base):
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
     client = relationship("Client", backref="relatives_associates")
+    
+    __table_args__ = (
+        # Backs the case-insensitive duplicate-name check in add/edit
+        Index("ix_cra_client_lname", "client_id", func.lower(func.trim(name))),
+        # Serves WHERE client_id = ? ORDER BY created_at DESC without a sort
+        Index("ix_client_relatives_and_associates_client_created", "client_id", created_at.desc()),
+    )
 
 class ClientAddress(Base):
     __tablename__ = "client_addresses"
@@ -135,6 +152,13 @@ class ClientSocialAccount(Base):
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
     client = relationship("Client", backref="social_accounts")
+    
+    __table_args__ = (
+        # Serves WHERE client_id = ? ORDER BY created_at DESC without a sort
+        Index("ix_client_social_accounts_client_created", "client_id", created_at.desc()),
+        # Target of ON CONFLICT in add; also backs the duplicate URL check in edit
+        Index("ux_social_client_url", "client_id", "profile_url", unique=True),
+    )
 
 class ClientResidentialHeatmapImage(Base):
     __tablename__ = "client_residential_and_heatmap_images"
@@ -147,6 +171,11 @@ class ClientResidentialHeatmapImage(Base):
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
     client = relationship("Client", backref="residential_heatmap_images")
+    
+    __table_args__ = (
+        # Serves WHERE client_id = ? ORDER BY created_at DESC without a sort
+        Index("ix_client_residential_and_heatmap_images_client_created", "client_id", created_at.desc()),
+    )
 
 class ClientDonorRecord(Base):
     __tablename__ = "client_donor_records"
@@ -285,6 +314,11 @@ class ClientSerpAnalysis(Base):
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     client = relationship("Client", backref="serp_analysis")
+    
+    __table_args__ = (
+        # Serves WHERE client_id = ? ORDER BY created_at DESC without a sort
+        Index("ix_client_serp_analysis_client_created", "client_id", created_at.desc()),
+    )
 
 class ClientAIAnalysis(Base):
     __tablename__ = "client_ai_analysis"
@@ -1,8 +1,14 @@
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from pydantic import AfterValidator, BaseModel, Field, ConfigDict, EmailStr
+from typing import Annotated, List, Literal, Optional
 from datetime import datetime, date
 import uuid
 
+from urls import client_image_url
+
+# Blank strings are accepted because the frontend sends "" for an unset dropdown
+ClientProvided = Literal["Yes", "No", ""]
+RelationshipType = Literal["Relative", "Associate", ""]
+
 # User Schemas
 class UserSignup(BaseModel):
     full_name: str
@@ -122,11 +128,11 @@ class BulkEmailUpload(BaseModel):
 # Phone Number Schemas
 class PhoneNumberCreate(BaseModel):
     phone_number: str
-    client_provided: Optional[str] = None
+    client_provided: Optional[ClientProvided] = None
 
 class PhoneNumberUpdate(BaseModel):
     phone_number: Optional[str] = None
-    client_provided: Optional[str] = None
+    client_provided: Optional[ClientProvided] = None
 
 class PhoneNumberResponse(BaseModel):
     id: uuid.UUID
@@ -140,16 +146,16 @@ class PhoneNumberResponse(BaseModel):
 
 class BulkPhoneUpload(BaseModel):
     phone_numbers_text: str
-    client_provided: Optional[str] = "No"
+    client_provided: Optional[ClientProvided] = "No"
 
 # Relative/Associate Schemas
 class RelativeAssociateCreate(BaseModel):
     name: str
-    relationship_type: Optional[str] = None
+    relationship_type: Optional[RelationshipType] = None
 
 class RelativeAssociateUpdate(BaseModel):
     name: Optional[str] = None
-    relationship_type: Optional[str] = None
+    relationship_type: Optional[RelationshipType] = None
 
 class RelativeAssociateResponse(BaseModel):
     id: uuid.UUID
@@ -163,7 +169,7 @@ class RelativeAssociateResponse(BaseModel):
 
 class BulkRelativeUpload(BaseModel):
     relatives_text: str
-    relationship_type: Optional[str] = "Associate"
+    relationship_type: Optional[RelationshipType] = "Associate"
 
 # Username Schemas
 class UsernameCreate(BaseModel):
@@ -252,6 +258,12 @@ class SocialAccountResponse(BaseModel):
     
     model_config = ConfigDict(from_attributes=True)
 
+class SocialAccountListItem(BaseModel):
+    id: uuid.UUID
+    platform: str
+    profile_url: str
+    created_at: datetime
+
 # Residential Heatmap Image Schemas
 class ResidentialHeatmapImageResponse(BaseModel):
     id: uuid.UUID
@@ -463,6 +475,18 @@ class ClientMatchingResultResponse(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+# Digital recognition records store image filenames; responses expand them to public URLs
+ImageUrls = Optional[List[Annotated[str, AfterValidator(client_image_url)]]]
+
+class ImageUploadRequest(BaseModel):
+    filename: str
+    content_type: str
+
+class PresignedImageUpload(BaseModel):
+    key: str
+    upload_url: str
+    image_url: str
+
 # Property Assessment Schemas
 class FrontHouseRecordCreate(BaseModel):
     home_visible_from_street: Optional[bool] = None
@@ -503,7 +527,7 @@ class FrontHouseRecordResponse(BaseModel):
     obstruction_of_view: str | None
     security_signage: bool | None
     real_estate_websites: List[str] | None
-    images: List[str] | None
+    images: ImageUrls
     created_at: datetime
     updated_at: datetime
 
@@ -551,7 +575,7 @@ class BackHouseRecordResponse(BaseModel):
     outbuildings_visible: bool | None
     pet_door_present: bool | None
     real_estate_websites: List[str] | None
-    images: List[str] | None
+    images: ImageUrls
     created_at: datetime
     updated_at: datetime
 
@@ -572,7 +596,7 @@ class InsideHouseRecordResponse(BaseModel):
     client_id: uuid.UUID
     layout_exposure: bool | None
     real_estate_websites: List[str] | None
-    images: List[str] | None
+    images: ImageUrls
     created_at: datetime
     updated_at: datetime
 
@@ -617,8 +641,21 @@ class GoogleStreetViewRecordResponse(BaseModel):
     obstruction_of_view: str | None
     security_signage: bool | None
     real_estate_websites: List[str] | None
-    images: List[str] | None
+    images: ImageUrls
     created_at: datetime
     updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+# Several property assessment record types created together
+class PropertyAssessmentRecordsCreate(BaseModel):
+    front_house: List[FrontHouseRecordCreate] = []
+    back_house: List[BackHouseRecordCreate] = []
+    inside_house: List[InsideHouseRecordCreate] = []
+    google_street_view: List[GoogleStreetViewRecordCreate] = []
+
+class PropertyAssessmentRecordsResponse(BaseModel):
+    front_house: List[FrontHouseRecordResponse]
+    back_house: List[BackHouseRecordResponse]
+    inside_house: List[InsideHouseRecordResponse]
+    google_street_view: List[GoogleStreetViewRecordResponse]
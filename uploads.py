@@ -0,0 +1,288 @@
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+import asyncio
+import hashlib
+import tempfile
+from secrets import token_hex
+import io
+import os
+
+# URL helpers live in a side-effect-free module so schemas can use them
+from urls import OBJECT_KEY_PREFIX, S3_PUBLIC_URL, client_image_url
+
+# Chunk size for kernel copies and the buffered fallback; 1 MiB keeps syscall counts low for multi-MB images
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Where multipart uploads spill to disk. Pointing this at the uploads filesystem lets copy_file_range
+# reflink (XFS/btrfs) instead of copying, so each upload's bytes are written to disk only once
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR")
+if UPLOAD_SPOOL_DIR:
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    tempfile.tempdir = UPLOAD_SPOOL_DIR
+
+# Files at least this large are dropped from the page cache after copying; they are served, not re-read here
+FADVISE_MIN_BYTES = 16 * 1024 * 1024
+
+# One copy of each distinct upload; stored files are hard links to these, so a file can be deleted independently
+OBJECTS_DIR = Path("uploads/.objects")
+OBJECTS_DIR.mkdir(parents=True, exist_ok=True)
+OBJECTS_STR = str(OBJECTS_DIR)
+
+ALLOWED_IMAGE_MIME = frozenset({"image/jpeg", "image/png", "image/webp"})
+ALLOWED_IMAGE_EXT = frozenset({".jpg", ".jpeg", ".png", ".webp"})
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+
+# Threads used by sync routes to save the files of one multi-file upload in parallel
+UPLOAD_SAVE_WORKERS = int(os.getenv("UPLOAD_SAVE_WORKERS", "8"))
+_save_pool = ThreadPoolExecutor(max_workers=UPLOAD_SAVE_WORKERS, thread_name_prefix="upload-save")
+
+# Whole-request cap enforced in main.py from Content-Length, before the body is spooled to disk
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(10 * MAX_UPLOAD_BYTES)))
+
+# Optional S3-compatible bucket (AWS S3, Cloudflare R2, ...) that browsers upload images to directly
+# with pre-signed PUT URLs, so the bytes never pass through this process. Unset keeps local storage only
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+if S3_BUCKET and not S3_PUBLIC_URL:
+    raise RuntimeError("S3_PUBLIC_URL must be set when S3_BUCKET is set")
+PRESIGNED_UPLOAD_EXPIRES = int(os.getenv("PRESIGNED_UPLOAD_EXPIRES", "900"))
+
+@lru_cache(maxsize=1)
+def _s3_client():
+    # boto3 is only needed when a bucket is configured
+    import boto3
+    return boto3.client("s3", endpoint_url=S3_ENDPOINT_URL)
+
+def presign_image_upload(owner: str, extension: str, content_type: str) -> dict:
+    """Reserve a new bucket key under owner and return it with a pre-signed PUT URL for the browser"""
+    if not S3_BUCKET:
+        raise HTTPException(status_code=503, detail="Direct image uploads are not configured")
+    if extension not in ALLOWED_IMAGE_EXT or content_type not in ALLOWED_IMAGE_MIME:
+        raise HTTPException(status_code=400, detail="Only JPEG, PNG and WebP images are allowed")
+    
+    key = f"{OBJECT_KEY_PREFIX}{owner}/{token_hex(16)}{extension}"
+    # Signing is local; the browser must send the same Content-Type header with its PUT
+    url = _s3_client().generate_presigned_url(
+        "put_object",
+        Params={"Bucket": S3_BUCKET, "Key": key, "ContentType": content_type},
+        ExpiresIn=PRESIGNED_UPLOAD_EXPIRES
+    )
+    return {"key": key, "upload_url": url, "image_url": client_image_url(key)}
+
+def owned_image_keys(owner: str, keys: list) -> list:
+    """Validate bucket keys sent back after direct uploads; each must have been issued for owner"""
+    prefix = f"{OBJECT_KEY_PREFIX}{owner}/"
+    if not all(isinstance(key, str) and key.startswith(prefix) and "/" not in key[len(prefix):] for key in keys):
+        raise HTTPException(status_code=400, detail="Invalid image key")
+    return list(keys)
+
+def delete_stored_image(name: str, directory: Path, owner: str) -> None:
+    """Delete a stored image, whether a file in directory or a bucket key issued for owner"""
+    if not name.startswith(OBJECT_KEY_PREFIX):
+        safe_unlink(directory / Path(name).name)
+        return
+    if not S3_BUCKET:
+        return
+    if not name.startswith(f"{OBJECT_KEY_PREFIX}{owner}/"):
+        print(f"Warning: Refusing to delete object {name} outside {owner}'s keys")
+        return
+    try:
+        _s3_client().delete_object(Bucket=S3_BUCKET, Key=name)
+    except Exception as e:
+        print(f"Warning: Could not delete object {name}: {str(e)}")
+
+def _sniff_image(header: bytes) -> bool:
+    """Check the leading bytes against the JPEG, PNG and WebP signatures"""
+    return (
+        header.startswith(b"\xff\xd8\xff")
+        or header.startswith(b"\x89PNG\r\n\x1a\n")
+        or (header[:4] == b"RIFF" and header[8:12] == b"WEBP")
+    )
+
+def file_extension(filename: str) -> str:
+    """Lower-cased extension of an uploaded filename, defaulting to .jpg"""
+    return os.path.splitext(filename)[1].lower() if filename else ".jpg"
+
+def validate_image(image: UploadFile) -> None:
+    """Reject non-image or oversized uploads before anything is written to disk"""
+    if image.content_type not in ALLOWED_IMAGE_MIME or file_extension(image.filename) not in ALLOWED_IMAGE_EXT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported image {image.filename}: allowed types are JPEG, PNG and WebP"
+        )
+    
+    if (image.size or 0) > MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image {image.filename} exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit"
+        )
+    
+    # The declared type comes from the client, so confirm it from the file's magic bytes
+    start = image.file.tell()
+    header = image.file.read(12)
+    image.file.seek(start)
+    if not _sniff_image(header):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported image {image.filename}: file content is not JPEG, PNG or WebP"
+        )
+
+def _copy_fd(src_fd: int, offset: int, path) -> None:
+    """Copy from a real file descriptor in the kernel, without user-space buffers"""
+    size = os.fstat(src_fd).st_size - offset
+    dst_fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # Reserve the whole file up front so it is laid out contiguously
+        if size > 0 and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(dst_fd, 0, size)
+            except OSError:
+                pass
+        
+        _copy_fd_range(src_fd, dst_fd, offset)
+        
+        if size >= FADVISE_MIN_BYTES and hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(src_fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            os.posix_fadvise(dst_fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(dst_fd)
+
+def _copy_fd_range(src_fd: int, dst_fd: int, offset: int) -> None:
+    """Kernel copy from offset to EOF, with copy_file_range falling back to sendfile"""
+    if hasattr(os, "copy_file_range"):
+        try:
+            while n := os.copy_file_range(src_fd, dst_fd, COPY_BUFFER_SIZE, offset):
+                offset += n
+            return
+        except OSError:
+            # e.g. cross-filesystem on older kernels - finish with sendfile from where we stopped
+            pass
+    
+    while n := os.sendfile(dst_fd, src_fd, offset, COPY_BUFFER_SIZE):
+        offset += n
+
+def _copy_buffered(src, path) -> None:
+    """Copy through one reused COPY_BUFFER_SIZE buffer"""
+    buffer = bytearray(COPY_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(path, "wb") as dst:
+        while n := src.readinto(view):
+            dst.write(view[:n])
+
+def save_upload(upload: UploadFile, path) -> None:
+    """Write an uploaded file to disk, zero-copy when it has been spooled to a real file"""
+    src = upload.file
+    
+    # Calling fileno() on an in-memory SpooledTemporaryFile would force a rollover, so only use it once rolled
+    if getattr(src, "_rolled", True) and hasattr(os, "sendfile"):
+        try:
+            src_fd = src.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            src_fd = None
+        
+        if src_fd is not None:
+            _copy_fd(src_fd, src.tell(), path)
+            return
+    
+    _copy_buffered(src, path)
+
+def _digest_upload(src) -> str:
+    """BLAKE2b of the rest of the file, leaving the position unchanged"""
+    start = src.tell()
+    digest = hashlib.blake2b(digest_size=16)
+    buffer = bytearray(COPY_BUFFER_SIZE)
+    view = memoryview(buffer)
+    while n := src.readinto(view):
+        digest.update(view[:n])
+    src.seek(start)
+    return digest.hexdigest()
+
+def _object_path(filename: str):
+    """Object backing a stored file named <digest>_<suffix>, or None for older uuid-named files"""
+    digest, sep, _ = filename.partition("_")
+    if not sep or len(digest) != 32:
+        return None
+    return OBJECTS_DIR / digest
+
+def store_upload(upload: UploadFile, directory: str) -> str:
+    """Save an upload under a new name in directory, sharing storage with identical earlier uploads. Returns the filename"""
+    start = upload.file.tell()
+    digest = _digest_upload(upload.file)
+    object_path = os.path.join(OBJECTS_STR, digest)
+    filename = f"{digest}_{token_hex(6)}{file_extension(upload.filename)}"
+    path = os.path.join(directory, filename)
+    
+    if not os.path.exists(object_path):
+        tmp_path = os.path.join(OBJECTS_STR, f"{digest}.{token_hex(16)}.tmp")
+        save_upload(upload, tmp_path)
+        try:
+            # link() never overwrites, so a concurrent identical upload simply wins
+            os.link(tmp_path, object_path)
+        except OSError:
+            pass
+        finally:
+            os.unlink(tmp_path)
+    
+    try:
+        os.link(object_path, path)
+    except OSError:
+        # The object was garbage-collected in between, or hard links are unsupported - keep a private copy
+        upload.file.seek(start)
+        save_upload(upload, path)
+    
+    return filename
+
+def sync_stored_files(directory: Path, names: list) -> None:
+    """Flush newly stored files and their directory entries to disk; run as a background task after the response"""
+    names = [name for name in names if not name.startswith(OBJECT_KEY_PREFIX)]
+    if not names:
+        return
+    try:
+        # Stored files are hard links, so syncing one also syncs its shared object's data
+        for name in names:
+            fd = os.open(directory / name, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        
+        for path in (directory, OBJECTS_DIR):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    except Exception as e:
+        print(f"Warning: Could not sync stored files in {directory}: {str(e)}")
+
+def save_uploads_parallel(save, uploads: list) -> list:
+    """Call save on each upload concurrently, returning the results in upload order; for sync routes"""
+    if len(uploads) < 2:
+        return [save(upload) for upload in uploads]
+    return list(_save_pool.map(save, uploads))
+
+async def save_uploads_concurrently(save, uploads: list) -> list:
+    """Run save on each upload concurrently in the threadpool, returning the results in upload order; for async routes"""
+    return list(await asyncio.gather(*[run_in_threadpool(save, upload) for upload in uploads]))
+
+def safe_unlink(path: Path) -> None:
+    """Delete a stored file, ignoring one that is already gone, and its object once nothing links to it"""
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Warning: Could not delete file {path.name}: {str(e)}")
+        return
+    
+    object_path = _object_path(path.name)
+    try:
+        if object_path is not None and object_path.stat().st_nlink == 1:
+            object_path.unlink()
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Warning: Could not delete object {object_path.name}: {str(e)}")
@@ -0,0 +1,31 @@
+import os
+
+# Public origin used to build stored file URLs; read once at import
+BASE_URL = os.getenv("BASE_URL", "https://obsecureiqbackendv1-production-e750.up.railway.app").rstrip("/")
+if not BASE_URL.startswith(("http://", "https://")):
+    raise RuntimeError(f"BASE_URL must be an absolute http(s) URL, got {BASE_URL!r}")
+
+# Public prefix of files under uploads/client_images
+CLIENT_IMAGES_URL = f"{BASE_URL}/uploads/client_images"
+
+# Public origin of the optional direct-upload bucket (see uploads.S3_BUCKET)
+S3_PUBLIC_URL = (os.getenv("S3_PUBLIC_URL") or "").rstrip("/")
+if S3_PUBLIC_URL and not S3_PUBLIC_URL.startswith(("http://", "https://")):
+    raise RuntimeError(f"S3_PUBLIC_URL must be an absolute http(s) URL, got {S3_PUBLIC_URL!r}")
+
+# Stored image names under this prefix are bucket keys rather than files in uploads/client_images
+OBJECT_KEY_PREFIX = "client_images/"
+
+def client_image_url(name: str) -> str:
+    """Public URL for a stored client image, from its filename, its bucket key or a full URL stored by an older record"""
+    if name.startswith(OBJECT_KEY_PREFIX):
+        return f"{S3_PUBLIC_URL}/{name}"
+    return f"{CLIENT_IMAGES_URL}/{name.rsplit('/', 1)[-1]}"
+
+def stored_image_name(url: str) -> str:
+    """Inverse of client_image_url: the filename or bucket key to store for an image URL"""
+    if S3_PUBLIC_URL and url.startswith(f"{S3_PUBLIC_URL}/{OBJECT_KEY_PREFIX}"):
+        return url[len(S3_PUBLIC_URL) + 1:]
+    if url.startswith(OBJECT_KEY_PREFIX):
+        return url
+    return url.rsplit('/', 1)[-1]
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from jose import jwt, JWTError
@@ -7,10 +7,8 @@ import hashlib, re, secrets, smtplib, os
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Annotated
-from dotenv import load_dotenv
+from functools import lru_cache
 
-# Load environment variables
-load_dotenv()
 try:
     from main import (
         SECRET_KEY, ALGORITHM, SMTP_EMAIL, SMTP_PASSWORD, 
@@ -83,17 +81,25 @@ def send_email(to_email: str, subject: str, body: str, html_body: str = None):
     server.send_message(msg)
     server.quit()
 
+@lru_cache(maxsize=10_000)
+def _decode_token(token: str):
+    """Verify a JWT once per distinct token; returns (email, exp timestamp)"""
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    return payload.get("sub"), payload.get("exp")
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security),
                      db: Session = Depends(get_db)):
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY,
-                             algorithms=[ALGORITHM])
-        email = payload.get("sub")
+        email, exp = _decode_token(credentials.credentials)
         if not email:
             raise HTTPException(status_code=401, detail="Invalid token")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    # A cached decode skips jose's expiry check, so re-check it here
+    if exp is not None and exp <= datetime.now(timezone.utc).timestamp():
+        raise HTTPException(status_code=401, detail="Invalid token")
+
     user = db.query(User).filter(User.email == email, User.status == "Active").first()
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
@@ -319,7 +325,7 @@ def get_all_users(admin_user: User = Depends(get_admin_user), db: Session = Depe
 
 @router.put("/users/{user_id}")
 def update_user(user_id: int, user_data: UserUpdate, admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -377,7 +383,7 @@ def admin_add_user(user_data: AdminAddUser, admin_user: User = Depends(get_admin
 
 @router.delete("/users/{user_id}")
 def delete_user(user_id: int, admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
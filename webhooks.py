@@ -0,0 +1,153 @@
+import asyncio
+import random
+import threading
+import time
+import os
+
+import httpx
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+# n8n error pages can be large; never buffer more than this from a webhook response
+MAX_RESPONSE_BYTES = 1024 * 1024
+ERROR_SNIPPET_BYTES = 200
+
+class LoggingRetry(Retry):
+    """Retry that prints each attempt so a degraded webhook is not silently masked"""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        new_retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        reason = f"status {response.status}" if response is not None else repr(error)
+        attempt = len(new_retry.history)
+        print(f"Warning: webhook {url} failed ({reason}), retry {attempt} ({new_retry.total} left)")
+        return new_retry
+
+# Only connection errors and gateway 5xx are retried - 4xx from n8n are logical failures
+WEBHOOK_RETRY = LoggingRetry(
+    total=3,
+    backoff_factor=0.3,
+    backoff_jitter=0.1,
+    status_forcelist=[502, 503, 504],
+    allowed_methods=["POST"],
+)
+
+# Separate connect/read timeouts so a slow TLS handshake fails fast while n8n gets time to respond;
+# the read timeout can be lowered per deployment once the n8n workflows are known to answer quickly
+WEBHOOK_CONNECT_TIMEOUT = 3.05
+WEBHOOK_READ_TIMEOUT = float(os.getenv("WEBHOOK_READ_TIMEOUT", "60"))
+WEBHOOK_TIMEOUT = (WEBHOOK_CONNECT_TIMEOUT, WEBHOOK_READ_TIMEOUT)
+
+# Consecutive failed calls that open the circuit, and how long it stays open before one trial call
+WEBHOOK_BREAKER_FAIL_MAX = 10
+WEBHOOK_BREAKER_RESET_TIMEOUT = 30
+
+class WebhookUnavailable(Exception):
+    """Raised instead of calling a webhook while the circuit is open"""
+
+class CircuitBreaker:
+    """Fail fast after fail_max consecutive failures instead of tying up workers on a down webhook"""
+
+    def __init__(self, fail_max: int, reset_timeout: float):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        # Sync callers record results from threadpool threads
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        """Raise WebhookUnavailable while open; once reset_timeout has passed, let one trial call through"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if remaining > 0:
+                raise WebhookUnavailable(f"Webhook unavailable, retrying in {remaining:.0f}s")
+            # Half-open: restart the window so concurrent calls keep failing fast during the trial
+            self._opened_at = time.monotonic()
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            if success:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._failures >= self.fail_max:
+                if self._opened_at is None:
+                    print(f"Warning: webhook circuit opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+
+# Keep-alive pool shared by all webhook calls; all n8n hooks live on one host, so they share one breaker
+webhook_breaker = CircuitBreaker(WEBHOOK_BREAKER_FAIL_MAX, WEBHOOK_BREAKER_RESET_TIMEOUT)
+webhook_session = requests.Session()
+webhook_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=WEBHOOK_RETRY))
+webhook_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=WEBHOOK_RETRY))
+
+# Async client for endpoints that await the webhook on the event loop; closed in the app lifespan
+# (the transport owns the pool, so http2/limits are set on it; its retries cover connect errors only)
+async_webhook_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(WEBHOOK_READ_TIMEOUT, connect=WEBHOOK_CONNECT_TIMEOUT),
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=20),
+        retries=WEBHOOK_RETRY.total,
+    ),
+)
+
+def _parse_json_body(body: bytes) -> dict:
+    """Decode a bounded webhook body, reporting a short snippet if it is not JSON"""
+    if len(body) > MAX_RESPONSE_BYTES:
+        raise ValueError(f"Webhook response exceeded {MAX_RESPONSE_BYTES} bytes")
+
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        snippet = body[:ERROR_SNIPPET_BYTES].decode("utf-8", errors="replace")
+        raise ValueError(f"Webhook returned non-JSON response: {snippet}")
+
+def read_json_response(response: requests.Response) -> dict:
+    """Parse a webhook response sent with stream=True, reading at most MAX_RESPONSE_BYTES"""
+    try:
+        body = response.raw.read(MAX_RESPONSE_BYTES + 1, decode_content=True)
+    finally:
+        response.close()
+
+    return _parse_json_body(body)
+
+async def post_webhook(url: str, content: bytes, retry: bool = True) -> tuple:
+    """POST a JSON body with async_webhook_client, retrying gateway 5xx unless retry is False. Returns (status_code, body)
+    with the body bounded by MAX_RESPONSE_BYTES. Raises WebhookUnavailable without calling out while webhook_breaker is open.
+    Pass retry=False for non-idempotent workflows: after a 502/504 n8n may already have run it. Connect errors are
+    still retried by the transport, since then nothing was sent"""
+    webhook_breaker.check()
+    attempt = 0
+    while True:
+        try:
+            async with async_webhook_client.stream(
+                "POST", url, content=content, headers={"Content-Type": "application/json"}
+            ) as response:
+                if retry and response.status_code in WEBHOOK_RETRY.status_forcelist and attempt < WEBHOOK_RETRY.total:
+                    attempt += 1
+                    print(f"Warning: webhook {url} failed (status {response.status_code}), retry {attempt} ({WEBHOOK_RETRY.total - attempt} left)")
+                else:
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        body += chunk
+                        if len(body) > MAX_RESPONSE_BYTES:
+                            break
+                    webhook_breaker.record(response.status_code < 500)
+                    return response.status_code, bytes(body)
+        except httpx.TransportError:
+            webhook_breaker.record(False)
+            raise
+
+        delay = WEBHOOK_RETRY.backoff_factor * (2 ** (attempt - 1)) + random.uniform(0, WEBHOOK_RETRY.backoff_jitter)
+        await asyncio.sleep(delay)
+
+async def post_json_webhook(url: str, content: bytes) -> dict:
+    """post_webhook, parsing the bounded response as JSON"""
+    _, body = await post_webhook(url, content)
+    return _parse_json_body(body)